@@ -11,12 +11,16 @@ and structure the code with a fully asynchronous CoverLoader.
 
 # Standard library
 import os
+import heapq
 import random
 import subprocess
 import logging
 import asyncio
 import threading
+import time
 import aiohttp
+from collections import deque
+from contextlib import asynccontextmanager
 from urllib.parse import urljoin
 from io import BytesIO
 
@@ -33,6 +37,15 @@ from ttkthemes import ThemedTk
 # Local modules
 import data_manager_json as dm
 from TagFinder import tag_fetch
+from cover_store import open_cover_manager
+from cover_priority import PRIORITY_ON_SCREEN, PRIORITY_PREFETCH, PRIORITY_BULK
+from cover_warmup import CoverWarmupJob, select_codes
+from favorites import FavoritesRepository
+from tag_search import TagNameIndex
+from tag_query import compile_query, QueryError
+from query_cache import QueryCache, normalize
+from stats import CodeStats
+from recommend import Recommender
 
 # --------------------
 # Constants & Globals
@@ -63,23 +76,101 @@ PROXIES = {"http": PROXY_URL, "https": PROXY_URL} if PROXY_URL else None
 
 CONCURRENT_FETCHES = 5  # Limit how many cover-URL fetches happen at once
 
+STARVATION_SECONDS = 2.0  # A queued request waiting this long is served regardless of priority
+
 
 # --------------------
 # Helper Classes & Functions
 # --------------------
 
+class PriorityScheduler:
+    """
+    Asyncio concurrency limiter with priority tiers.
+
+    Like a semaphore with `slots` permits, but a freed permit goes to the
+    most urgent waiter (lowest priority number) instead of the oldest one,
+    so interactive requests jump ahead of queued background work.
+    Starvation guard: once a waiter has been queued for longer than
+    `max_wait` seconds, every other permit goes to the oldest overdue waiter
+    whatever its tier, so background work keeps moving under constant
+    interactive load without ever taking more than half the permits.
+    """
+
+    def __init__(self, slots, tiers=3, max_wait=STARVATION_SECONDS):
+        self._free = slots
+        self._queues = [deque() for _ in range(tiers)]   # per tier: (enqueued_at, future)
+        self.max_wait = max_wait
+        self._last_grant_aged = False
+
+    def _has_waiters(self):
+        return any(self._queues)
+
+    async def acquire(self, priority=PRIORITY_ON_SCREEN):
+        if self._free > 0 and not self._has_waiters():
+            self._free -= 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._queues[priority].append((time.monotonic(), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # We were granted a permit just as we got cancelled: pass it on
+                self.release()
+            raise
+
+    def release(self):
+        self._free += 1
+        self._wake()
+
+    def _wake(self):
+        while self._free > 0:
+            queue = self._next_queue()
+            if queue is None:
+                return
+            _, future = queue.popleft()
+            if future.done():            # Cancelled while waiting
+                continue
+            self._free -= 1
+            future.set_result(None)
+
+    def _next_queue(self):
+        """Pick the queue to serve: every other time an overdue waiter if any, else the most urgent tier."""
+        if not self._last_grant_aged:
+            now = time.monotonic()
+            overdue = [q for q in self._queues if q and now - q[0][0] >= self.max_wait]
+            if overdue:
+                self._last_grant_aged = True
+                return min(overdue, key=lambda q: q[0][0])
+        self._last_grant_aged = False
+        for queue in self._queues:
+            if queue:
+                return queue
+        return None
+
+    @asynccontextmanager
+    async def slot(self, priority=PRIORITY_ON_SCREEN):
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+
 class CoverLoader:
     """
     An asynchronous cover loader that:
       - Retrieves cover URLs for nhentai codes.
       - Caches results to avoid refetching.
-      - Uses a semaphore to limit concurrency.
+      - Limits concurrency with a priority scheduler, so on-screen covers
+        are fetched before prefetch and bulk (scrape / warm-up) requests.
     """
 
     def __init__(self):
         self.cover_cache = {}            # code -> cover_url (string or None)
         self.session = None              # aiohttp.ClientSession (created lazily)
-        self.sem = asyncio.Semaphore(CONCURRENT_FETCHES)
+        self.scheduler = PriorityScheduler(CONCURRENT_FETCHES)
         self._session_lock = asyncio.Lock()
 
     async def open_session(self):
@@ -145,11 +236,11 @@ class CoverLoader:
         logging.error(f"[fetch_cover_url] All attempts failed for code {code}.")
         return None
 
-    async def load_cover_image_if_needed(self, code: int) -> str:
+    async def load_cover_image_if_needed(self, code: int, priority: int = PRIORITY_ON_SCREEN) -> str:
         """
         Public method to get the cover URL for a given code.
           - Checks our in-memory cache first.
-          - If missing, fetches with fetch_cover_url (sem-protected).
+          - If missing, fetches with fetch_cover_url (scheduled at `priority`).
         Returns the cover URL or None if it fails.
         """
         if code in self.cover_cache:
@@ -158,14 +249,35 @@ class CoverLoader:
         # Make sure we have a session
         await self.open_session()
 
-        # Limit concurrency via semaphore
-        async with self.sem:
+        # Limit concurrency, most urgent requests first
+        async with self.scheduler.slot(priority):
             cover_url = await self.fetch_cover_url(code)
 
         # Cache it (even if None) so we don't keep retrying
         self.cover_cache[code] = cover_url
         return cover_url
 
+    async def download_cover(self, cover_url: str, priority: int = PRIORITY_ON_SCREEN) -> bytes:
+        """
+        Download the raw cover image bytes from `cover_url` (scheduled at `priority`).
+        Retries up to RETRY_ATTEMPTS. Returns None if it fails.
+        """
+        await self.open_session()
+
+        for attempt in range(RETRY_ATTEMPTS):
+            try:
+                async with self.scheduler.slot(priority):
+                    async with self.session.get(cover_url, proxy=PROXY_URL) as resp:
+                        if resp.status != 200:
+                            logging.warning(f"[download_cover] Failed to download {cover_url} (status: {resp.status}).")
+                            return None
+                        return await resp.read()
+            except Exception as e:
+                logging.error(f"[download_cover] Attempt {attempt+1}: Failed to download {cover_url}: {e}")
+
+        logging.error(f"[download_cover] All attempts failed for {cover_url}.")
+        return None
+
 
 def open_in_browser(code, page=None):
     """
@@ -200,6 +312,21 @@ def load_cover_image_sync(cover_url, size=(100, 150), load_images=True):
         return None
 
 
+def load_cached_cover(cover_store, code, size=(100, 150)):
+    """
+    Return a PhotoImage for `code` from the local cover store, or None if it isn't cached.
+    """
+    data = cover_store.get(code)
+    if data is None:
+        return None
+    try:
+        image = Image.open(BytesIO(data)).resize(size)
+        return ImageTk.PhotoImage(image)
+    except Exception as e:
+        logging.error(f"Error loading cached cover for code {code}: {e}")
+        return None
+
+
 def get_name(code):
     """
     Fetch the "pretty" name/title of the given code from nhentai.
@@ -220,6 +347,14 @@ def get_name(code):
     return "Unknown Name"
 
 
+def load_codes(settings):
+    """The code store, with the banned tags in `settings` hidden locally."""
+    code_store = dm.load_code_store()
+    code_store.set_banned_tags(settings['banned']['tags'])
+    code_store.visible_tag_counts()  # Count tags here, off the UI thread; later hides keep it current
+    return code_store
+
+
 def code_read():
     """Return a dict {code: {...}} from JSON (the main data)."""
     return dm.load_codes_json()
@@ -240,9 +375,25 @@ def get_tags(banned_tags):
 class MultiPageApp:
     """
     Main application. Houses the Tk root, overall settings, pages, etc.
+
+    Startup is staged: the window and notebook are drawn straight away with
+    every tab disabled, while codes, tags, favorites and the cover store load
+    concurrently on the background loop. Each page lists the datasets it
+    needs in REQUIRES and is enabled as soon as those have arrived.
     """
 
+    # Dataset name -> loader, run on a worker thread at startup
+    DATASETS = {
+        "codes": lambda app: load_codes(app.settings),
+        "tags": lambda app: TagNameIndex(dm.read_tags() or {}),
+        "favorites": lambda app: FavoritesRepository.load(),
+        "covers": lambda app: open_cover_manager(app.settings),
+    }
+
     def __init__(self):
+        self.startup_began = time.perf_counter()
+        self.startup_times = {}        # milestone / dataset -> seconds since startup began
+
         self.settings = dm.load_settings()
 
         # Update directories based on settings
@@ -267,58 +418,157 @@ class MultiPageApp:
         font_size = self.settings["theme"]["font_size"]
         self.style.configure(".", font=(font_family, font_size))
 
-        # Show a loading label initially
-        self.loading_label = ttk.Label(self.root, text="Loading data, please wait...")
-        self.loading_label.pack(pady=50)
-
-        # Full list of codes loaded from JSON
-        self.full_list = dm.load_codes_json()
-        # Only codes marked visible
-        self.master_list = {
-            key: value for key, value in self.full_list.items() if value.get('visible') == 1
-        }
-
         self.current_theme = self.settings['theme']['name']
 
+        # Filled in by the background load (see DATASETS):
+        # full list of codes, held in a columnar CodeStore (read-only mapping;
+        # change it through set_visible / set_cover / put)
+        self.full_list = None
+        # Live view of the codes marked visible
+        self.master_list = None
+        self.tags = None
+        # TagNameIndex over self.tags, shared by every page's tag-name search
+        self.tag_index = None
+        # FavoritesRepository: the one in-memory copy of the favorites, pages subscribe to its changes
+        self.favorites = None
+        # Local cover cache (per-file directory or packed store, see settings["covers"]),
+        # kept under the configured size cap with least-recently-viewed eviction
+        self.cover_store = None
+        self.codes_dirty = False       # Codes added / covers resolved since the last save_codes()
+        self.changed_codes = set()     # Codes added or retagged since the last save_codes()
+        self.ready = set()             # Names of the datasets loaded so far
+        # Recent filter / search results, keyed on the query and the version of the data behind them
+        self.query_cache = QueryCache(maxsize=32)
+
         # 3) Create the CoverLoader (async) for retrieving cover URLs
         self.cover_loader = CoverLoader()
 
-        # Open the aiohttp session asynchronously
-        future = asyncio.run_coroutine_threadsafe(self.cover_loader.open_session(), self.loop)
-        future.result()
+        # 4) Draw the shell, then load everything in the background
+        self.initialize_ui()
+        asyncio.run_coroutine_threadsafe(self.load_data(), self.loop)
 
-        # 4) Run data loading in a background thread
-        threading.Thread(target=self.load_data_async, args=(self.master_list,)).start()
+    # ----- Code visibility / additions -----
+    # master_list and the store's tag index and sampler follow these changes
+    # in O(1) each; nothing is rebuilt. hide / show persist as one change-log
+    # line (or row), set_cover as one row with SQLite; add only marks the codes
+    # dirty, and save_codes() writes them in one go (after a scrape, and on
+    # exit): their rows with SQLite, the whole snapshot with JSON files.
 
-    def list_update(self, codes_dict):
-        """Update in-memory lists and save to JSON."""
-        self.master_list = {
-            key: value for key, value in codes_dict.items() if value.get('visible') == 1
-        }
-        dm.save_codes_json(codes_dict)
+    def hide(self, code):
+        """Take `code` off the random pages (favorited, discarded, in progress, removed)."""
+        if code in self.full_list and self.full_list[code]["visible"] == 1:
+            dm.set_code_visible(self.full_list, code, 0)
 
-    def load_data_async(self, codes_dict):
-        """Load data in a separate thread, then init UI on main thread."""
-        try:
-            # Instead of asyncio.run(...), use a separate function that we can call directly
-            # or schedule with run_coroutine_threadsafe
-            future = asyncio.run_coroutine_threadsafe(self.load_data(codes_dict), self.loop)
-            future.result()  # Wait for completion
-            self.root.after(0, self.initialize_ui)  # Schedule UI init in the main Tk thread
-        except Exception as e:
-            logging.error(f"Error loading data: {e}", exc_info=True)
+    def show(self, code):
+        """Put a hidden `code` back on the random pages."""
+        if code in self.full_list and self.full_list[code]["visible"] != 1:
+            dm.set_code_visible(self.full_list, code, 1)
 
-    async def load_data(self, codes_dict):
+    def add(self, records):
         """
-        Example spot for background tasks like auto-updates.
+        Add or retag codes: records = {code: {"tags": ..., "cover": ..., "visible": ...}},
+        "cover" and "visible" being optional (they keep their current values, or "" and 1).
         """
-        self.tags = dm.read_tags()
-        # Optionally, await a small delay
-        await asyncio.sleep(1)
+        for code, record in records.items():
+            self.full_list.put(code, tags=record.get("tags", ()), cover=record.get("cover"), visible=record.get("visible"))
+        self.changed_codes.update(records)
+        self.codes_dirty = True
 
-    def initialize_ui(self):
-        self.loading_label.destroy()
+    def set_cover(self, code, cover_url):
+        dm.set_code_covers(self.full_list, {code: cover_url})
+        self.codes_dirty = True
+
+    def compile_tag_query(self, query):
+        """
+        Compile a tag filter (see tag_query) against the loaded tags, ordered by
+        visible code counts. Plans are cached until the tags change.
+        """
+        return self.query_cache.get(
+            ("tag query", normalize(query), self.tag_index.version),
+            lambda: compile_query(query, self.tag_index, self.full_list.visible_tag_counts())
+        )
+
+    def tag_query_mask(self, plan):
+        """The rows of full_list matching `plan` (see tag_query), cached until the codes or tags change."""
+        return self.query_cache.get(
+            ("tag mask", normalize(plan.text), self.tag_index.version, self.full_list.version),
+            lambda: plan.mask(self.full_list)
+        )
+
+    def save_codes(self):
+        """Queue a save of the code store if codes were added or covers resolved since the last one."""
+        if self.codes_dirty:
+            changed, self.changed_codes = self.changed_codes, set()
+            self.codes_dirty = False
+            dm.save_codes_json(self.full_list, changed=changed)
+
+    async def load_data(self):
+        """Open the HTTP session and load every dataset concurrently."""
+        await asyncio.gather(
+            self.cover_loader.open_session(),
+            *(self._load_dataset(name, loader) for name, loader in self.DATASETS.items())
+        )
 
+    async def _load_dataset(self, name, loader):
+        """Run one loader off the event loop and hand its result to the Tk thread."""
+        try:
+            value = await asyncio.to_thread(loader, self)
+        except Exception as e:
+            logging.error(f"[startup] Could not load {name}: {e}", exc_info=True)
+            self.root.after(0, self.loading_label.config, {"text": f"Could not load {name}, see the log."})
+            return
+        self.root.after(0, self.dataset_loaded, name, value)
+
+    def dataset_loaded(self, name, value):
+        """Store a loaded dataset (Tk thread) and enable the pages that were waiting on it."""
+        if name == "codes":
+            self.full_list = value
+            self.master_list = value.visible_view()
+        elif name == "tags":
+            self.tag_index = value
+            self.tags = value.tags
+        elif name == "favorites":
+            self.favorites = value
+        elif name == "covers":
+            self.cover_store = value
+        self.ready.add(name)
+        self.startup_times[name] = time.perf_counter() - self.startup_began
+        logging.info(f"[startup] {name} ready after {self.startup_times[name]:.3f}s")
+
+        for page, title in self.pending_pages[:]:
+            if self.ready.issuperset(page.REQUIRES):
+                self.pending_pages.remove((page, title))
+                self.enable_page(page, title)
+
+        missing = [dataset for dataset in self.DATASETS if dataset not in self.ready]
+        if missing:
+            self.loading_label.config(text=f"Loading {', '.join(missing)}...")
+        else:
+            self.loading_label.destroy()
+            self.collect_cover_garbage()
+            self.root.after_idle(self._mark_interactive)
+
+    def enable_page(self, page, title):
+        """Give a page its data and make its tab selectable."""
+        getattr(page, "on_data_ready", page.update_page)()
+        self.notebook.tab(page, state="normal", text=title)
+        if not self.notebook.select():
+            self.notebook.select(page)
+
+    def _mark_first_paint(self, event=None):
+        self.notebook.unbind("<Expose>", self._first_paint_binding)
+        self.startup_times["first_paint"] = time.perf_counter() - self.startup_began
+        logging.info(f"[startup] First paint after {self.startup_times['first_paint']:.3f}s")
+
+    def _mark_interactive(self):
+        self.startup_times["interactive"] = time.perf_counter() - self.startup_began
+        datasets = ", ".join(f"{name} {self.startup_times[name]:.3f}s" for name in self.DATASETS)
+        logging.info(
+            f"[startup] Interactive after {self.startup_times['interactive']:.3f}s "
+            f"(first paint {self.startup_times.get('first_paint', 0):.3f}s; {datasets})"
+        )
+
+    def initialize_ui(self):
         # Menu for theme settings
         self.style_menu = tk.Menu(self.root)
         self.root.config(menu=self.style_menu)
@@ -326,10 +576,16 @@ class MultiPageApp:
         self.style_menu.add_cascade(label="File", menu=self.theme_menu)
         self.theme_menu.add_command(label='Options', command=self.open_theme_selector)
 
+        # Status line until every dataset has loaded
+        self.loading_label = ttk.Label(self.root, text=f"Loading {', '.join(self.DATASETS)}...")
+        self.loading_label.pack(side=tk.BOTTOM, pady=5)
+
         # Create the notebook
         self.notebook = ttk.Notebook(self.root)
         self.notebook.pack(fill="both", expand=True)
+        self._first_paint_binding = self.notebook.bind("<Expose>", self._mark_first_paint, add="+")
         self.pages = []
+        self.pending_pages = []        # (page, title) still waiting on data
 
         # Add pages (could rename them to something more descriptive)
         self.add_page(HomePage, "Home Page")
@@ -340,30 +596,37 @@ class MultiPageApp:
 
         # Adjust window size whenever tab changes
         self.notebook.bind("<<NotebookTabChanged>>", self.adjust_window_size)
-        self.adjust_window_size()
+
+    def collect_cover_garbage(self):
+        """
+        Drop cached covers for codes that are neither visible, in progress nor favorited.
+        The keep-set is captured here; the deletions run on a background thread.
+        """
+        keep_codes = set(self.full_list.visible_codes().tolist())
+        keep_codes.update(int(code) for code in self.settings['in_progress'])
+        keep_codes.update(self.favorites)
+        self.cover_store.start_garbage_collection(keep_codes)
 
     def add_page(self, page_class, title):
-        """Instantiate and add a page to the notebook."""
-        if callable(page_class):
-            page_instance = page_class(self.notebook, self.notebook, self)
-        else:
-            page_instance = page_class(self.notebook, self.notebook, self)
-        self.notebook.add(page_instance, text=title)
+        """Instantiate a page and add it to the notebook, disabled until its data is ready."""
+        page_instance = page_class(self.notebook, self.notebook, self)
+        self.notebook.add(page_instance, text=f"{title} (loading)", state="disabled")
         self.pages.append(page_instance)
+        self.pending_pages.append((page_instance, title))
 
     def get_page(self, index):
         """Return a reference to a page by its index in the notebook."""
         return self.pages[index]
 
     def update_all_pages(self):
-        """Convenience method to call `update_page()` on every page (if it exists)."""
+        """Convenience method to call `update_page()` on every page whose data has loaded."""
         for page in self.pages:
-            if hasattr(page, 'update_page'):
+            if hasattr(page, 'update_page') and self.ready.issuperset(page.REQUIRES):
                 page.update_page()
 
     def adjust_window_size(self, event=None):
         """Auto-size the window to fit the current page's requested size."""
-        if not hasattr(self, 'notebook'):
+        if not hasattr(self, 'notebook') or not self.notebook.select():
             return
         current_page = self.notebook.nametowidget(self.notebook.select())
         current_page.update_idletasks()
@@ -379,6 +642,7 @@ class MultiPageApp:
     def mainloop(self):
         self.root.mainloop()
 
+
         # On exit, close the aiohttp session (if open) using the background loop
         try:
             future = asyncio.run_coroutine_threadsafe(self.cover_loader.close_session(), self.loop)
@@ -390,6 +654,15 @@ class MultiPageApp:
         self.loop.call_soon_threadsafe(self.loop.stop)
         self.thread.join()
 
+        if self.cover_store is not None:
+            self.cover_store.close()
+
+        if self.full_list is not None:
+            self.save_codes()
+
+        # Let the background writer finish pending saves (settings, codes, favorites, cover access)
+        dm.flush()
+
     def open_theme_selector(self):
         """Open the theme selector popup."""
         ThemeSelectorPopup(self)
@@ -444,10 +717,10 @@ class ThemeSelectorPopup(tk.Toplevel):
             "Are you sure you want to reset all codes? This action cannot be undone."
         )
         if confirm:
-            all_keys = list(self.controller.full_list.keys())
-            for key in all_keys:
-                self.controller.full_list[key]['visible'] = 1
-            dm.save_codes_json(self.controller.full_list)
+            if self.controller.full_list is None:
+                messagebox.showinfo("Still Loading", "Codes are still loading, try again in a moment.")
+                return
+            dm.set_all_codes_visible(self.controller.full_list)
             messagebox.showinfo("Reset Complete", "All codes have been reset successfully.")
 
 
@@ -460,6 +733,8 @@ class HomePage(ttk.Frame):
     The Home Page, showing a welcome label and a togglable "section" frame
     for entering a code, marking progress, discarding, etc.
     """
+    REQUIRES = ("codes", "favorites", "covers")
+
     def __init__(self, parent, notebook, controller):
         super().__init__(parent)
         self.notebook = notebook
@@ -506,8 +781,6 @@ class HomePage(ttk.Frame):
         )
         self.toggle_button.pack(pady=10)
 
-        self.update_page()
-
     def load_in_progress_data(self):
         """Load 'in_progress' dict from settings."""
         return self.controller.settings['in_progress']
@@ -544,14 +817,11 @@ class HomePage(ttk.Frame):
             cover_url = self.controller.full_list.get(code_int, {}).get('cover')
             if cover_url is None or cover_url == "":
                 cover_url = self.get_cover_url_sync(code_int)
-                self.controller.full_list[code_int]['cover'] = cover_url
-                
-            image_path = os.path.join(COVERS_DIR, f"{code_int}.jpg")
-            if os.path.exists(image_path):
-                img = Image.open(image_path).resize((100, 150))
-                photo_img = ImageTk.PhotoImage(img)
+                if code_int in self.controller.full_list:
+                    self.controller.set_cover(code_int, cover_url)
                 
-            else:
+            photo_img = load_cached_cover(self.controller.cover_store, code_int, (100, 150))
+            if photo_img is None:
                 photo_img = load_cover_image_sync(
                     cover_url,
                     size=(100, 150),
@@ -653,22 +923,13 @@ class HomePage(ttk.Frame):
             tags = self.controller.full_list[code].get('tags', [])
         else:
             tags = []
-        dm.add_favorites_json({code: {'tags': tags, 'name': name}})
+        self.controller.favorites.add(code, tags=tags, name=name)
 
         # Mark invisible in the main list
-        if code in self.controller.master_list:
-            self.controller.full_list[code]['visible'] = 0
-            self.controller.list_update(self.controller.full_list)
-
-            # Remove from in_progress as well
-            if str(code) in self.controller.settings['in_progress']:
-                del self.controller.settings['in_progress'][str(code)]
-                dm.write_settings(self.controller.settings)
+        self.controller.hide(code)
 
-        # If the code was in the local list, remove it
-        if code_str in self.in_progress:
-            del self.controller.settings['in_progress'][str(code)]
-            dm.write_settings(self.controller.settings)
+        # Remove from in_progress as well
+        dm.clear_in_progress(self.controller.settings, code)
 
         self._reset_entries()
         self.toggle_section()
@@ -686,16 +947,10 @@ class HomePage(ttk.Frame):
             return
 
         if code in self.controller.master_list:
-            self.controller.full_list[code]['visible'] = 0
-            self.controller.list_update(self.controller.full_list)
+            self.controller.cover_store.remove(code)
+        self.controller.hide(code)
 
-            cover_path = os.path.join(COVERS_DIR, f"{code}.jpg")
-            if os.path.exists(cover_path):
-                os.remove(cover_path)
-
-        if code_str in self.in_progress:
-            del self.controller.settings['in_progress'][str(code)]
-            dm.write_settings(self.controller.settings)
+        dm.clear_in_progress(self.controller.settings, code)
 
         self._reset_entries()
         self.toggle_section()
@@ -717,12 +972,9 @@ class HomePage(ttk.Frame):
             logging.warning(f"Invalid code: {code_str}")
             return
 
-        if code in self.controller.master_list:
-            self.controller.full_list[code]['visible'] = 0
-            self.controller.list_update(self.controller.full_list)
+        self.controller.hide(code)
 
-        self.controller.settings['in_progress'][str(code)] = page_str
-        dm.write_settings(self.controller.settings)
+        dm.set_in_progress(self.controller.settings, code, page_str)
 
         self._reset_entries()
         self.toggle_section()
@@ -766,7 +1018,11 @@ class PageOne(ttk.Frame):
     """
     Page that displays random codes as clickable images.
     Users can filter by tags, toggle image loading, etc.
+    In "More like my favorites" mode the codes whose tags best match the
+    favorites are shown instead, best first.
     """
+    REQUIRES = ("codes", "tags", "favorites", "covers")
+
     def __init__(self, parent, notebook, controller):
         super().__init__(parent)
         self.notebook = notebook
@@ -774,7 +1030,10 @@ class PageOne(ttk.Frame):
 
         self.button_width = 150
         self.button_height = 225
-        self.search_filter = []
+        self.search_filter = None  # Compiled tag query, or None
+        self.next_codes = []     # Next batch, picked ahead of time so its covers can be prefetched
+        self.recommender = None  # Built the first time recommendations are asked for
+        self.recommended = set() # Codes already recommended, so Refresh moves down the ranking
 
         # Filter frame
         self.search_frame = ttk.Frame(self)
@@ -798,6 +1057,15 @@ class PageOne(ttk.Frame):
         )
         self.image_checkbox.pack()
 
+        self.recommend_var = tk.BooleanVar(value=self.controller.settings['app'].get('recommend', False))
+        self.recommend_checkbox = ttk.Checkbutton(
+            self.image_checkbox_frame,
+            text="More like my favorites",
+            variable=self.recommend_var,
+            command=self.toggle_recommend
+        )
+        self.recommend_checkbox.pack()
+
         self.filter_button = ttk.Button(self.search_frame, text="Filter", command=self.apply_filter)
         self.filter_button.pack(side=tk.LEFT, padx=5)
 
@@ -819,8 +1087,6 @@ class PageOne(ttk.Frame):
         self.popup_menu = tk.Menu(self, tearoff=0)
         self.popup_menu.add_command(label="Remove", command=self.hide_code)
 
-        self.update_page()
-        
     def show_popup(self, event):
         self.current_button = event.widget
         self.popup_menu.tk_popup(event.x_root, event.y_root)
@@ -831,8 +1097,8 @@ class PageOne(ttk.Frame):
         code = getattr(self.current_button, 'code_val', None)
         if code is None:
             return
-        self.controller.full_list[int(code)]['visible'] = 0
-        dm.save_codes_json(self.controller.full_list)
+        self.controller.hide(int(code))
+        self.controller.cover_store.remove(int(code))
         self.current_button.destroy()
 
     def get_cover_url_sync(self, code_int):
@@ -844,23 +1110,23 @@ class PageOne(ttk.Frame):
 
     def apply_filter(self):
         """
-        Convert user query into a list of tag IDs and store them in self.search_filter.
+        Compile the user's tag query (see tag_query) and store it in self.search_filter.
         """
-        query = self.filter_entry.get().lower()
-        if query:
-            matched_tags = {
-                key: value
-                for key, value in self.controller.tags.items()
-                if query in value.lower()
-            }
-            self.search_filter = list(matched_tags.keys())          
-        else:
-            self.search_filter = []
+        query = self.filter_entry.get().strip()
+        try:
+            self.search_filter = self.controller.compile_tag_query(query) if query else None
+        except QueryError as e:
+            self.loading_label.config(text=f"Bad filter: {e}")
+            return
+        self.next_codes = []
+        self.recommended.clear()
         self.update_page()
 
     def clear_filter(self):
         """Clear the search filter and refresh codes."""
-        self.search_filter = []
+        self.search_filter = None
+        self.next_codes = []
+        self.recommended.clear()
         self.filter_entry.delete(0, tk.END)
         self.update_page()
 
@@ -870,6 +1136,14 @@ class PageOne(ttk.Frame):
         dm.write_settings(self.controller.settings)
         self.controller.update_all_pages()
 
+    def toggle_recommend(self):
+        """Switch between random codes and codes like the favorites."""
+        self.controller.settings['app']['recommend'] = self.recommend_var.get()
+        dm.write_settings(self.controller.settings)
+        self.next_codes = []
+        self.recommended.clear()
+        self.update_page()
+
     def refresh_codes(self):
         """Simulate re-fetching images for the currently displayed codes."""
         self.refresh_button.config(state="disabled")
@@ -892,21 +1166,15 @@ class PageOne(ttk.Frame):
         for widget in self.code_buttons_frame.winfo_children():
             widget.destroy()
 
-        # If user is filtering by certain tags, reduce to those codes
-        if self.search_filter:
-            filtered_codes = []
-            for c in self.controller.master_list.keys():
-                tags_set = self.controller.master_list[c]['tags']
-                if any(tid in tags_set for tid in self.search_filter):
-                    filtered_codes.append(c)
+        # Use the batch picked (and prefetched) last time, unless some of it has gone away since
+        if self.next_codes and all(c in self.controller.master_list for c in self.next_codes):
+            selected_codes = self.next_codes
         else:
-            filtered_codes = list(self.controller.master_list.keys())
+            selected_codes = self.pick_codes()
 
-        if not filtered_codes:
+        if not selected_codes:
             self.loading_label.config(text="No codes match your filter!")
             return
-
-        selected_codes = random.sample(filtered_codes, min(6, len(filtered_codes)))
         self.images = []
 
         # For each code, fetch cover URL from background loop, then load the image sync
@@ -914,14 +1182,12 @@ class PageOne(ttk.Frame):
             cover_url = self.controller.full_list.get(code_val, {}).get('cover')
             if cover_url is None or cover_url == "":
                 cover_url = self.get_cover_url_sync(code_val)
-                self.controller.full_list[code_val]['cover'] = cover_url
-                
-            image_path = os.path.join(COVERS_DIR, f"{code_val}.jpg")
-            if os.path.exists(image_path):
-                img = Image.open(image_path).resize((self.button_width, self.button_height))
-                photo_img = ImageTk.PhotoImage(img)
+                self.controller.set_cover(code_val, cover_url)
                 
-            else:
+            photo_img = load_cached_cover(
+                self.controller.cover_store, code_val, (self.button_width, self.button_height)
+            )
+            if photo_img is None:
                 photo_img = load_cover_image_sync(
                     cover_url,
                     size=(self.button_width, self.button_height),
@@ -959,11 +1225,50 @@ class PageOne(ttk.Frame):
         self.loading_label.config(text="")
         self.controller.adjust_window_size()
 
+        self.prefetch_next()
+
+    def pick_codes(self):
+        """
+        Six random visible codes, restricted to the tag filter if there is one.
+        In recommend mode, the six best matches not recommended yet; once the
+        ranking runs out it starts again from the top.
+        """
+        where = self.controller.tag_query_mask(self.search_filter) if self.search_filter else None
+        if self.recommend_var.get():
+            if self.recommender is None:
+                self.recommender = Recommender(self.controller.full_list, self.controller.favorites)
+            codes = self.recommender.top(6, where=where, exclude=self.recommended)
+            if not codes and self.recommended:
+                self.recommended.clear()
+                codes = self.recommender.top(6, where=where)
+            self.recommended.update(codes)
+            return codes
+        return self.controller.full_list.sample_visible(
+            6,
+            where=where,
+            no_repeat=self.controller.settings['app'].get('no_repeat', False)
+        )
+
+    def prefetch_next(self):
+        """
+        Pick the next batch now and resolve its cover URLs in the background,
+        below on-screen requests, so the next refresh doesn't wait on the network.
+        """
+        self.next_codes = self.pick_codes()
+        for code_val in self.next_codes:
+            if not self.controller.full_list.get(code_val, {}).get('cover'):
+                asyncio.run_coroutine_threadsafe(
+                    self.controller.cover_loader.load_cover_image_if_needed(code_val, PRIORITY_PREFETCH),
+                    self.controller.loop
+                )
+
 
 class PageTwo(ttk.Frame):
     """
     Page for displaying Favorites with basic name/tag filtering and pagination.
     """
+    REQUIRES = ("codes", "tags", "favorites", "covers")
+
     def __init__(self, parent, notebook, controller):
         super().__init__(parent)
         self.notebook = notebook
@@ -1031,121 +1336,86 @@ class PageTwo(ttk.Frame):
         # This list holds either ("folder", folder_name) or ("code", code_val).
         self.display_list = []
 
+    def on_data_ready(self):
+        self.favorites_dict = self.controller.favorites
+        self.favorites_dict.subscribe(self.on_favorites_changed)
         self.apply_filters()
 
-    def apply_filters(self):
-        """Load favorites, filter by name/tag, then sort by user preference."""
-        self.favorites_dict = dm.load_favorite_json()
+    def on_favorites_changed(self, op, code):
+        self.apply_filters()
 
+    def apply_filters(self):
+        """Filter the favorites by name/tag/folder, then sort by user preference."""
         # Grab filter inputs
         name_query = self.name_search_entry.get().strip().lower()
-        tag_query = self.tag_filter_entry.get().strip().lower()
+        tag_query = self.tag_filter_entry.get().strip()
         folder_query = self.folder_filter_entry.get().strip().lower()
         sort_pref = self.sort_combobox.get()
 
-        # Convert comma-separated tag strings to tag IDs
-        tag_ids_to_filter = []
-        if tag_query:
-            for tag_part in tag_query.split(","):
-                tag_part = tag_part.strip().lower()
-                try:
-                    tag_ids_to_filter.append(int(tag_part))
-                except ValueError:
-                    tag_ids_to_filter.extend(self.find_tag_id(tag_part))
-
-        # We'll build a "raw" list, then sort it
-        combined_items = []
-        self.folders = []
-
-        for code_val, fav_entry in self.favorites_dict.items():
-            if not fav_entry or not isinstance(fav_entry, dict):
-                continue
-
-            # Basic info
-            name_val = str(fav_entry.get("name", ""))
-            folder_val = str(fav_entry.get("folder", "") or "")
-            folder_lower = folder_val.lower()
-            code_tags = set(fav_entry.get("tags", []))
-
-            # Check filters
-            match_name = (name_query in name_val.lower()) if name_query else True
-            # For folder filtering, if folder_query is empty, we don't use it as a gate to hide codes.
-            # But if folder_query is present, we only want codes that match it.
-            match_folder = True
-            if folder_query:
-                # If user typed a folder filter, only show codes that have that folder
-                match_folder = (folder_query in folder_lower)
-            else:
-                # If user left folder filter blank, we do not necessarily hide items by folder.
-                # We'll handle logic below on how to show/hide foldered codes.
-                pass
+        # Same filters, same favorites and tags: reuse the last result
+        alphabetical = sort_pref == "Alphabetical"
+        key = (
+            "favorites", name_query, normalize(tag_query), folder_query, alphabetical,
+            self.favorites_dict.version, self.controller.tag_index.version
+        )
+        try:
+            combined_items, self.folders = self.controller.query_cache.get(
+                key, lambda: self.filter_favorites(name_query, tag_query, folder_query, alphabetical)
+            )
+        except QueryError as e:
+            messagebox.showerror("Tag filter", str(e))
+            return
 
-            # Tag match
-            if tag_ids_to_filter:
-                match_tags = any(tid in code_tags for tid in tag_ids_to_filter)
-            else:
-                match_tags = True
+        if sort_pref == "Random":
+            combined_items = random.sample(combined_items, len(combined_items))
 
-            if not (match_name and match_folder and match_tags):
-                # This item doesn't match all filters -> skip
-                continue
+        self.display_list = combined_items
+        self.current_page = 0
+        self.update_page()
 
-            # ----------------------------------
-            # Decide what to add to display_list:
-            # - If the folder filter is blank, we only show folder BUTTONS (not codes) 
-            #   if they actually have a folder, 
-            #   and show code if it's un-foldered
-            #
-            # - If the folder filter is set, we show only codes from that folder.
-            # ----------------------------------
-
-            if folder_query == "":
-                # 1) If this code has a folder, we do NOT add it as ("code", code_val).
-                #    Instead, we add one folder button for that folder. 
-                #    But we must ensure not to add duplicates of the same folder.
-                if folder_val.strip():
-                    # We'll store it as ("folder", folder_val), but avoid duplicates
-                    # by only adding if it's not already in combined_items.
-                    # (We can also handle duplicates by building a set of folder names first.)
-                    already_has = any(
-                        (it[0] == "folder" and it[1].lower() == folder_val.lower())
-                        for it in combined_items
-                    )
-                    if not already_has:
-                        combined_items.append(("folder", folder_val, code_val))
-                        self.folders.append(folder_val)
+    def filter_favorites(self, name_query, tag_query, folder_query, alphabetical):
+        """
+        ([display items], [folder names]) for the given filters: codes and
+        folder buttons, alphabetical if asked, otherwise folders first.
+        Raises QueryError if the tag query is bad.
+        """
+        # Compile the tag query (comma-separated names and ids still mean "any of")
+        tag_plan = self.controller.compile_tag_query(tag_query) if tag_query else None
+
+        favorites = self.favorites_dict
+        matches = favorites.query(name=name_query, folder=folder_query, tag_query=tag_plan, ordered=alphabetical)
+        folders = list(favorites.folders().values())
+
+        if folder_query == "":
+            # Un-foldered favorites show as codes; foldered ones as one button per folder
+            # with any match, whose cover is the folder's precomputed choice
+            code_items = []
+            matched_folders = set()
+            for code_val, fav_entry in matches:
+                folder_key = favorites.folder(code_val).strip().casefold()
+                if folder_key:
+                    matched_folders.add(folder_key)
                 else:
-                    # 2) If there's no folder, this is un-foldered => show the code
-                    combined_items.append(("code", code_val, 0))
-
+                    code_items.append(("code", code_val, 0))
+            folder_names = favorites.folders()
+            folder_items = [
+                ("folder", folder_names[key], favorites.folder_cover(key))
+                for key in sorted(matched_folders)
+            ]
+            if alphabetical:
+                # Both lists are already in order; merge them by the cached keys
+                combined_items = list(heapq.merge(
+                    folder_items,
+                    code_items,
+                    key=lambda item: item[1].casefold() if item[0] == "folder" else favorites.sort_key(item[1])
+                ))
             else:
-                # The user typed a folder filter => we only show codes that match that folder
-                # So, if code_val is indeed in the folder, show it
-                if folder_val.strip():
-                    # Show the actual code now
-                    combined_items.append(("code", code_val, 0))
-                else:
-                    # If it's un-foldered, it doesn't belong to that folder
-                    pass
-
-        # ---------- Sorting ----------
-        if sort_pref == "Alphabetical":
-            def sort_key(item):
-                if item[0] == "folder":
-                    # Sort by folder name
-                    return item[1].lower()
-                else:
-                    # item == ("code", code_val)
-                    c_val = item[1]
-                    return self.favorites_dict[c_val]["name"].lower()
-            combined_items.sort(key=sort_key)
+                combined_items = folder_items + code_items
+        else:
+            # The user typed a folder filter => only codes in the matching folders
+            combined_items = [("code", code_val, 0) for code_val, fav_entry in matches]
 
-        elif sort_pref == "Random":
-            random.shuffle(combined_items)
-
-        self.display_list = combined_items
-        self.current_page = 0
-        self.update_page()
+        return combined_items, folders
 
     def update_page(self):
         """Show the current page of favorite items."""
@@ -1179,9 +1449,7 @@ class PageTwo(ttk.Frame):
                 label = ttk.Label(folder_frame, text=label_text, wraplength=100, justify="center")
                 
                 
-                image_path = os.path.join(COVERS_DIR, f"{first}.jpg")
-                img = Image.open(image_path).resize((100, 150))
-                photo_img = ImageTk.PhotoImage(img)
+                photo_img = load_cached_cover(self.controller.cover_store, first, (100, 150))
 
                 folder_name = value
                 folder_btn = tk.Button(
@@ -1206,14 +1474,11 @@ class PageTwo(ttk.Frame):
                 code_val = value
                 # Ensure the code is in self.controller.full_list
                 if code_val not in self.controller.full_list:
-                    self.controller.full_list[code_val] = {"tags": [], "cover": "", "visible": 1}
+                    self.controller.add({code_val: {"tags": (), "cover": "", "visible": 1}})
 
                 cover_url = self.controller.full_list[code_val].get("cover") or None
-                image_path = os.path.join(COVERS_DIR, f"{code_val}.jpg")
-                if os.path.exists(image_path):
-                    img = Image.open(image_path).resize((100, 150))
-                    photo_img = ImageTk.PhotoImage(img)
-                else:
+                photo_img = load_cached_cover(self.controller.cover_store, code_val, (100, 150))
+                if photo_img is None:
                     photo_img = load_cover_image_sync(
                         cover_url,
                         size=(100, 150),
@@ -1296,14 +1561,9 @@ class PageTwo(ttk.Frame):
         self.popup_menu.add_cascade(label = "Add to Group", menu = self.add_menu)
 
         # If this code is actually in a folder, show "Remove from folder" option
-        if code:
-            fav_dict = dm.load_favorite_json()
-            if code in fav_dict:
-                folder_name = fav_dict[code].get("folder", "")
-                if folder_name != None:
-                    if folder_name.strip():
-                        # The code is in a folder, so let's allow removal
-                        self.popup_menu.add_command(label="Remove from folder", command=self.remove_from_folder)
+        if code and self.favorites_dict.folder(code).strip():
+            # The code is in a folder, so let's allow removal
+            self.popup_menu.add_command(label="Remove from folder", command=self.remove_from_folder)
 
         self.popup_menu.tk_popup(event.x_root, event.y_root)
         
@@ -1319,9 +1579,7 @@ class PageTwo(ttk.Frame):
 
         new_folder = simpledialog.askstring("Move to Folder", "Enter new folder name:")
         if new_folder is not None:
-            self.favorites_dict[code]["folder"] = new_folder
-            dm.save_favorites_json(self.favorites_dict)
-            self.apply_filters()
+            self.favorites_dict.set_folder(code, new_folder)
             
     def remove_from_folder(self):
         """
@@ -1333,12 +1591,7 @@ class PageTwo(ttk.Frame):
         if not code:
             return
 
-        fav_dict = dm.load_favorite_json()
-        if code in fav_dict:
-            fav_dict[code]["folder"] = ""  # Clear the folder
-            dm.save_favorites_json(fav_dict)
-
-        self.apply_filters()
+        self.favorites_dict.set_folder(code, "")  # Clear the folder
         
     def add_to_folder(self, new_folder):
         if self.current_button is None:
@@ -1348,9 +1601,7 @@ class PageTwo(ttk.Frame):
             return
         
         if new_folder is not None:
-            self.favorites_dict[code]["folder"] = new_folder
-            dm.save_favorites_json(self.favorites_dict)
-            self.apply_filters()
+            self.favorites_dict.set_folder(code, new_folder)
 
     def discard(self):
         """
@@ -1362,20 +1613,8 @@ class PageTwo(ttk.Frame):
         if code is None:
             return
 
-        fav_dict = dm.load_favorite_json()
-        if code in fav_dict:
-            del fav_dict[code]
-            dm.save_favorites_json(fav_dict)
-
-        # Re-apply filters
-        self.apply_filters()
-
-    def find_tag_id(self, tag_input):
-        """
-        Return a list of tag IDs whose tag name contains `tag_input`.
-        """
-        all_tags = self.controller.tags
-        return [tag_id for tag_id, tag_name in all_tags.items() if tag_input in tag_name.lower()]
+        # The change notification re-applies the filters
+        self.favorites_dict.remove(code)
 
 
 class PageThree(ttk.Frame):
@@ -1384,7 +1623,11 @@ class PageThree(ttk.Frame):
     - Banning/unbanning tags
     - Scraping new codes
     - Updating existing list
+    Tag buttons show how many visible codes and favorites carry each tag, and
+    hovering one previews how many codes banning (or unbanning) it affects.
     """
+    REQUIRES = ("codes", "tags", "favorites", "covers")
+
     def __init__(self, parent, notebook, controller):
         super().__init__(parent)
         self.notebook = notebook
@@ -1416,6 +1659,10 @@ class PageThree(ttk.Frame):
         self.tag_update_button = ttk.Button(self.nav_frame, text="Update tags", command=self.start_tag_fetch)
         self.tag_update_button.grid(row=0, column=5, padx=10, pady=10)
 
+        self.warm_covers_button = ttk.Button(self.nav_frame, text="Warm covers", command=self.start_cover_warmup)
+        self.warm_covers_button.grid(row=0, column=6, padx=10, pady=10)
+        self.warmup_job = None
+
         # For searching tags
         self.search_entry = ttk.Entry(self.search_frame, width=30)
         self.search_entry.pack(side=tk.LEFT, padx=5)
@@ -1424,10 +1671,24 @@ class PageThree(ttk.Frame):
         self.search_button = ttk.Button(self.search_frame, text="Search", command=self.search_tags)
         self.search_button.pack(side=tk.LEFT, padx=5)
 
+        # Tag order
+        self.sort_combobox = ttk.Combobox(
+            self.search_frame,
+            values=["By name", "By code count"],
+            state="readonly",
+            width=14
+        )
+        self.sort_combobox.pack(side=tk.LEFT, padx=5)
+        self.sort_combobox.set("By name")
+        self.sort_combobox.bind("<<ComboboxSelected>>", lambda e: self.search_tags())
+        self.tag_search = ""          # The (normalized) search filtered_tags was made from
+
+        # Ban preview for the tag under the mouse
+        self.ban_preview_label = ttk.Label(self, text="")
+        self.ban_preview_label.pack(pady=(0, 5))
+
         # Banned tags
         self.banned_tag_codes = self.controller.settings['banned']['tags']
-        # Convert numeric IDs -> names for display
-        self.banned_tag_names = [self.controller.tags.get(code, str(code)) for code in self.banned_tag_codes]
 
         # Hide banned label checkbox
         self.hide_banned = tk.BooleanVar(value=False)
@@ -1465,8 +1726,11 @@ class PageThree(ttk.Frame):
         )
         self.update_list_button.pack(side=tk.LEFT, padx=10)
 
+    def on_data_ready(self):
+        # Convert numeric IDs -> names for display
+        self.banned_tag_names = [self.controller.tags.get(code, str(code)) for code in self.banned_tag_codes]
         # Current tags for display
-        self.filtered_tags = self.controller.tags
+        self.filtered_tags = self.find_tags("")
         self.update_page()
 
     def start_tag_fetch(self):
@@ -1500,10 +1764,80 @@ class PageThree(ttk.Frame):
             self.progress_bar.stop()
             self.progress_window.destroy()
 
-            # Reload tags after fetching
-            self.controller.tags = dm.read_tags()
-            self.filtered_tags = self.controller.tags
-            self.update_page()
+            # Reload tags after fetching, on the Tk thread so no search sees a half-updated index
+            self.controller.root.after(0, self._tags_fetched, dm.read_tags() or {})
+
+    def _tags_fetched(self, tags):
+        self.controller.tag_index.update(tags)
+        self.controller.tags = tags
+        self.filtered_tags = self.find_tags(self.tag_search)
+        self.update_page()
+
+    def start_cover_warmup(self):
+        """
+        Download covers for all visible codes in the background, or only those
+        carrying a tag that matches the current tag search, if there is one.
+        """
+        if self.warmup_job is not None and not self.warmup_job.finished:
+            return
+
+        tag_ids = list(self.filtered_tags.keys()) if self.search_entry.get().strip() else None
+        if tag_ids == []:
+            messagebox.showinfo("Warm Covers", "No tag matches the search, so there is nothing to warm.")
+            return
+        codes = select_codes(self.controller.full_list, self.controller.cover_store, tag_ids)
+        self.warmup_job = CoverWarmupJob(
+            self.controller.cover_loader,
+            self.controller.cover_store,
+            self.controller.full_list,
+            codes
+        )
+
+        self.warmup_window = Toplevel(self)
+        self.warmup_window.title("Warming Covers")
+        self.warmup_window.geometry("400x140")
+        self.warmup_window.protocol("WM_DELETE_WINDOW", self.stop_cover_warmup)
+
+        self.warmup_label = ttk.Label(self.warmup_window, text=self.warmup_job.progress_text())
+        self.warmup_label.pack(pady=10)
+
+        self.warmup_bar = Progressbar(self.warmup_window, length=300, mode="determinate")
+        self.warmup_bar["maximum"] = max(self.warmup_job.total, 1)
+        self.warmup_bar.pack(pady=5)
+
+        self.warmup_pause_button = ttk.Button(self.warmup_window, text="Pause", command=self.toggle_cover_warmup)
+        self.warmup_pause_button.pack(pady=5)
+
+        asyncio.run_coroutine_threadsafe(self.warmup_job.run(), self.controller.loop)
+        self._check_warmup_progress()
+
+    def toggle_cover_warmup(self):
+        """Pause or resume the running warm-up job."""
+        if self.warmup_job.is_paused():
+            self.warmup_job.resume()
+            self.warmup_pause_button.config(text="Pause")
+        else:
+            self.warmup_job.pause()
+            self.warmup_pause_button.config(text="Resume")
+
+    def stop_cover_warmup(self):
+        """Stop the job; covers cached so far are kept and skipped next time."""
+        self.warmup_job.stop()
+
+    def _check_warmup_progress(self):
+        """Repeatedly poll the warm-up job for progress."""
+        job = self.warmup_job
+        self.warmup_bar["value"] = job.done + job.failed
+        self.warmup_label.config(text=job.progress_text())
+        if not job.finished:
+            self.after(500, self._check_warmup_progress)
+        else:
+            self.warmup_window.destroy()
+            if job.resolved_covers:
+                dm.set_code_covers(self.controller.full_list, job.resolved_covers)
+                self.controller.codes_dirty = True
+                self.controller.save_codes()
+            logging.info(f"Cover warm-up finished: {job.progress_text()}")
 
     def toggle_banned_label(self):
         """Show or hide the Banned Tags label."""
@@ -1550,13 +1884,10 @@ class PageThree(ttk.Frame):
             self.after(200, self._check_scrape_progress)
         else:
             self.progress_window.destroy()
-            # Reload data
-            self.controller.full_list = dm.load_codes_json()
-            self.controller.master_list = {
-                k: v for k, v in self.controller.full_list.items() if v.get('visible') == 1
-            }
-            logging.info("Scraping completed and data reloaded.")
+            # The scrape added to the in-memory store as it went, and saved it when done
+            logging.info("Scraping completed.")
             self.controller.update_all_pages()
+            self.controller.collect_cover_garbage()
 
     async def _scrape_async(self, update):
         """
@@ -1613,6 +1944,7 @@ class PageThree(ttk.Frame):
                 logging.info(f"No galleries found on page {page_idx}. Stopping early.")
                 break
 
+            batch, covers = {}, {}
             for comic in comics:
                 tag_strs = comic.get("data-tags", "").split()
                 try:
@@ -1633,25 +1965,19 @@ class PageThree(ttk.Frame):
 
                     # If new, fetch cover
                     if code_val not in self.controller.full_list:
-                        cover_url = await self.controller.cover_loader.load_cover_image_if_needed(code_val)
-                        self.controller.full_list[code_val] = {
-                            'tags': tag_ids,
-                            'cover': cover_url,
-                            'visible': 1
-                        }
+                        cover_url = await self.controller.cover_loader.load_cover_image_if_needed(code_val, PRIORITY_BULK)
+                        batch[code_val] = {"tags": tag_ids, "cover": cover_url, "visible": 1}
                     else:
                         # If it existed, maybe update tags / cover
-                        self.controller.full_list[code_val]['tags'] = tag_ids
-                        if not self.controller.full_list[code_val].get('cover'):
-                            cover_url = await self.controller.cover_loader.load_cover_image_if_needed(code_val)
-                            self.controller.full_list[code_val]['cover'] = cover_url
+                        batch[code_val] = {"tags": tag_ids}
+                        if not self.controller.full_list.cover(code_val):
+                            covers[code_val] = await self.controller.cover_loader.load_cover_image_if_needed(code_val, PRIORITY_BULK)
 
+            self.controller.root.after(0, self._store_scraped, batch, covers)
             self.scrape_progress = page_idx
             await asyncio.sleep(0)
 
-        dm.save_codes_json(self.controller.full_list)
-        self.scrape_done = True
-        logging.info("Scraping completed successfully.")
+        self.controller.root.after(0, self._finish_scrape)
 
     async def update_scrape_async(self, update):
         """
@@ -1663,8 +1989,8 @@ class PageThree(ttk.Frame):
             url_base += f'+-{tag_name}'
         url_first = f"{url_base}&page=1"
 
-        all_codes = self.controller.full_list.keys()
-        last_code = max(all_codes) if all_codes else 0
+        all_codes = self.controller.full_list.all_codes()
+        last_code = int(all_codes[-1]) if len(all_codes) else 0
 
         try:
             first_resp = await asyncio.to_thread(requests.get, url_first, proxies=PROXIES, timeout=TIMEOUT)
@@ -1705,6 +2031,7 @@ class PageThree(ttk.Frame):
                 logging.info(f"No galleries found on page {page_idx}. Stopping early.")
                 break
 
+            batch, covers = {}, {}
             for comic in comics:
                 tag_strs = comic.get("data-tags", "").split()
                 try:
@@ -1727,25 +2054,33 @@ class PageThree(ttk.Frame):
                         break
 
                     if code_val not in self.controller.full_list:
-                        cover_url = await self.controller.cover_loader.load_cover_image_if_needed(code_val)
-                        self.controller.full_list[code_val] = {
-                            'tags': tag_ids,
-                            'cover': cover_url,
-                            'visible': 1
-                        }
+                        cover_url = await self.controller.cover_loader.load_cover_image_if_needed(code_val, PRIORITY_BULK)
+                        batch[code_val] = {"tags": tag_ids, "cover": cover_url, "visible": 1}
                     else:
-                        self.controller.full_list[code_val]['tags'] = tag_ids
-                        if not self.controller.full_list[code_val].get('cover'):
-                            cover_url = await self.controller.cover_loader.load_cover_image_if_needed(code_val)
-                            self.controller.full_list[code_val]['cover'] = cover_url
+                        batch[code_val] = {"tags": tag_ids}
+                        if not self.controller.full_list.cover(code_val):
+                            covers[code_val] = await self.controller.cover_loader.load_cover_image_if_needed(code_val, PRIORITY_BULK)
 
+            self.controller.root.after(0, self._store_scraped, batch, covers)
             if code_val < last_code:
                 break
 
             self.scrape_progress = code_val - last_code
             await asyncio.sleep(0)
 
-        dm.save_codes_json(self.controller.full_list)
+        self.controller.root.after(0, self._finish_scrape)
+
+    # The scrapes run on the background loop; the store is only changed on the
+    # Tk thread, so each page's codes are handed over with root.after
+
+    def _store_scraped(self, batch, covers):
+        self.controller.add(batch)
+        for code, cover_url in covers.items():
+            self.controller.set_cover(code, cover_url)
+
+    def _finish_scrape(self):
+        # Queued after every page's _store_scraped, so the save sees them all
+        self.controller.save_codes()
         self.scrape_done = True
         logging.info("Scraping completed successfully.")
 
@@ -1761,20 +2096,28 @@ class PageThree(ttk.Frame):
 
         start_index = self.current_page * self.items_per_page
         end_index = start_index + self.items_per_page
-        page_items = list(self.filtered_tags.items())[start_index:end_index]
+        page_items = self.ordered_tags()[start_index:end_index]
 
+        code_counts = self.controller.full_list.visible_tag_counts()
+        favorites = self.controller.favorites
         cols = 4
         for idx, (tag_code, tag_name) in enumerate(page_items):
             r = idx // cols
             c = idx % cols
+            if tag_code in self.banned_tag_codes:
+                count_text = "banned"
+            else:
+                count_text = f"{code_counts[tag_code] if tag_code < len(code_counts) else 0} codes"
             button = tk.Button(
                 self.items_frame,
-                text=str(tag_name),
+                text=f"{tag_name}\n{count_text}, {favorites.tag_count(tag_code)} favs",
                 compound="center",
                 font=(self.controller.settings["theme"]["font_family"], self.controller.settings["theme"]["font_size"]),
                 command=lambda code=tag_code, name=tag_name: self.ban_tag((code, name))
             )
             button.grid(row=r, column=c, padx=10, pady=10, sticky="nsew")
+            button.bind("<Enter>", lambda e, code=tag_code, name=tag_name: self.preview_ban(code, name))
+            button.bind("<Leave>", lambda e: self.ban_preview_label.config(text=""))
 
         # Pagination
         self.prev_button.config(state=tk.NORMAL if self.current_page > 0 else tk.DISABLED)
@@ -1783,6 +2126,44 @@ class PageThree(ttk.Frame):
 
         self.controller.adjust_window_size()
 
+    def find_tags(self, query):
+        """{id: name} of the tags matching `query` (all of them if empty), cached until the tags change."""
+        self.tag_search = normalize(query)
+        return self.controller.query_cache.get(
+            ("tags", self.tag_search, self.controller.tag_index.version),
+            lambda: self.controller.tag_index.matching(query) if self.tag_search else self.controller.tags
+        )
+
+    def ordered_tags(self):
+        """
+        [(tag id, name)] of filtered_tags in the chosen order, by name or by
+        visible code count (ties by name). Cached per tags version, so paging
+        only slices; sorting by count is also redone when the codes change.
+        """
+        by_count = self.sort_combobox.get() == "By code count"
+        full_list = self.controller.full_list
+        key = ("tag order", self.tag_search, by_count, self.controller.tag_index.version, by_count and full_list.version)
+
+        def order():
+            items = sorted(self.filtered_tags.items(), key=lambda item: item[1].casefold())
+            if by_count:
+                counts = full_list.visible_tag_counts()
+                items.sort(key=lambda item: -int(counts[item[0]]) if 0 <= item[0] < len(counts) else 0)
+            return items
+        return self.controller.query_cache.get(key, order)
+
+    def preview_ban(self, tag_code, tag_name):
+        """Say how many codes banning (or unbanning) the tag would hide (or bring back)."""
+        impact = self.controller.full_list.ban_impact(tag_code)
+        if tag_code in self.banned_tag_codes:
+            text = f"Unbanning \"{tag_name}\" brings back {impact} codes"
+        else:
+            text = f"Banning \"{tag_name}\" hides {impact} codes"
+        favorite_count = self.controller.favorites.tag_count(tag_code)
+        if favorite_count:
+            text += f" ({favorite_count} favorites carry it)"
+        self.ban_preview_label.config(text=text)
+
     def next_page(self):
         self.current_page += 1
         self.update_page()
@@ -1796,55 +2177,58 @@ class PageThree(ttk.Frame):
         Toggle ban/unban of the given tag.
         """
         tag_code, tag_name = tag
+        # banned_tag_codes is the settings list itself
         if tag_code not in self.banned_tag_codes:
             self.banned_tag_codes.append(tag_code)
             self.banned_tag_names.append(tag_name)
-            self.controller.settings['banned']['tags'].append(tag_code)
         else:
             self.banned_tag_codes.remove(tag_code)
             self.banned_tag_names.remove(tag_name)
-            self.controller.settings['banned']['tags'].remove(tag_code)
 
         dm.write_settings(self.controller.settings)
 
+        # Hide (or bring back) the codes already scraped that carry the tag
+        self.controller.full_list.set_banned_tags(self.banned_tag_codes)
+
         # If search is empty, reset back to full tag list
         if not self.search_entry.get().strip():
             self._reset_search()
-        self.update_page()
+        self.controller.update_all_pages()
 
     def search_tags(self):
         """Filter the displayed tags by the search query."""
-        query = self.search_entry.get().lower()
-        if query:
-            self.filtered_tags = {
-                key: value
-                for key, value in self.controller.tags.items()
-                if query in value.lower()
-            }
-        else:
-            self.filtered_tags = self.controller.tags
+        self.filtered_tags = self.find_tags(self.search_entry.get())
         self.current_page = 0
         self.update_page()
 
     def _reset_search(self):
         self.search_entry.delete(0, tk.END)
-        self.filtered_tags = self.controller.tags
+        self.filtered_tags = self.find_tags("")
         self.update_page()
 
 
 class PageFour(ttk.Frame):
     """
-    Statistics page showing basic counts of usable codes, favorites, etc.
+    Statistics page showing basic counts of usable codes, favorites, etc.,
+    plus tag analytics: the most common tags among visible codes and among
+    favorites, the tags most often seen with a given one, and how many codes
+    the banned tags hide.
     """
+    REQUIRES = ("codes", "tags", "favorites")
+
     def __init__(self, parent, notebook, controller):
         super().__init__(parent)
         self.notebook = notebook
         self.controller = controller
+        self.stats = None
 
         ttk.Label(self, text="Statistics", font=(self.controller.settings["theme"]["font_family"], 16)).pack(pady=10)
         self.usable_codes_label = ttk.Label(self, text="Usable Codes: 0")
         self.usable_codes_label.pack(pady=5)
 
+        self.visible_codes_label = ttk.Label(self, text="Visible Codes: 0")
+        self.visible_codes_label.pack(pady=5)
+
         self.in_progress_label = ttk.Label(self, text="In Progress: 0")
         self.in_progress_label.pack(pady=5)
 
@@ -1857,28 +2241,86 @@ class PageFour(ttk.Frame):
         self.banned_label = ttk.Label(self, text="Banned Tags: 0")
         self.banned_label.pack(pady=5)
 
+        # Tag analytics
+        self.analytics_frame = ttk.Frame(self, borderwidth=2, relief="ridge")
+        self.analytics_frame.pack(pady=10, padx=10, fill="x")
+
+        ttk.Label(self.analytics_frame, text="Top tags (visible)").grid(row=0, column=0, padx=10, pady=5)
+        ttk.Label(self.analytics_frame, text="Top tags (favorites)").grid(row=0, column=1, padx=10, pady=5)
+        self.top_tags_label = ttk.Label(self.analytics_frame, text="", justify="left")
+        self.top_tags_label.grid(row=1, column=0, padx=10, sticky="n")
+        self.top_favorite_tags_label = ttk.Label(self.analytics_frame, text="", justify="left")
+        self.top_favorite_tags_label.grid(row=1, column=1, padx=10, sticky="n")
+
+        self.co_frame = ttk.Frame(self.analytics_frame)
+        self.co_frame.grid(row=0, column=2, padx=10, pady=5)
+        ttk.Label(self.co_frame, text="Seen with:").pack(side=tk.LEFT)
+        self.co_tag_entry = ttk.Entry(self.co_frame, width=15)
+        self.co_tag_entry.pack(side=tk.LEFT, padx=5)
+        self.co_tag_entry.bind("<Return>", lambda e: self.update_analytics())
+        self.co_tags_label = ttk.Label(self.analytics_frame, text="", justify="left")
+        self.co_tags_label.grid(row=1, column=2, padx=10, sticky="n")
+
+        self.ban_share_label = ttk.Label(self.analytics_frame, text="")
+        self.ban_share_label.grid(row=2, column=0, columnspan=3, pady=5)
+
         ttk.Button(self, text="Refresh Stats", command=self.update_page).pack(pady=15)
 
+        # The analytics are only worked out while the page is on screen
+        self.bind("<Map>", lambda e: self.update_analytics())
+
+    def on_data_ready(self):
+        self.stats = CodeStats(self.controller.full_list, self.controller.favorites)
+        self.controller.favorites.subscribe(lambda op, code: self.update_page())
         self.update_page()
 
     def update_page(self):
-        usable_codes = code_read()
-        self.usable_codes_label.config(text=f"Usable Codes: {len(usable_codes)}")
+        self.usable_codes_label.config(text=f"Usable Codes: {len(self.controller.full_list)}")
+        self.visible_codes_label.config(text=f"Visible Codes: {len(self.controller.master_list)}")
 
         in_progress_count = len(self.controller.settings['in_progress'])
         self.in_progress_label.config(text=f"In Progress: {in_progress_count}")
 
-        favorites = dm.load_favorite_json()
-        self.favorites_label.config(text=f"Favorites: {len(favorites)}")
+        self.favorites_label.config(text=f"Favorites: {len(self.controller.favorites)}")
 
-        tags_list = dm.read_tags()
-        self.tags_label.config(text=f"Tags: {len(tags_list)}")
+        self.tags_label.config(text=f"Tags: {len(self.controller.tags)}")
 
         banned = self.controller.settings['banned']['tags']
         self.banned_label.config(text=f"Banned Tags: {len(banned)}")
 
+        if self.winfo_ismapped():
+            self.update_analytics()
+
         self.controller.adjust_window_size()
 
+    def _tag_lines(self, counts):
+        return "\n".join(f"{self.controller.tags.get(tag_id, str(tag_id))} ({count})" for tag_id, count in counts)
+
+    def update_analytics(self):
+        if self.stats is None:
+            return
+        top_tags = self.stats.top_tags(10)
+        self.top_tags_label.config(text=self._tag_lines(top_tags))
+        self.top_favorite_tags_label.config(text=self._tag_lines(self.stats.top_favorite_tags(10)))
+
+        # Tags seen with the one asked for (the most common match), else with the most common tag
+        query = self.co_tag_entry.get().strip()
+        if query:
+            matches = self.controller.tag_index.search(query)
+            frequency = self.stats.tag_frequency()
+            tag_id = max(matches, key=lambda t: frequency[t] if t < len(frequency) else 0, default=None)
+        else:
+            tag_id = top_tags[0][0] if top_tags else None
+        if tag_id is None:
+            self.co_tags_label.config(text="No such tag")
+        else:
+            name = self.controller.tags.get(tag_id, str(tag_id))
+            self.co_tags_label.config(text=f"[{name}]\n" + self._tag_lines(self.stats.co_occurring(tag_id, 10)))
+
+        hidden, marked = self.stats.ban_share()
+        share = 100 * hidden / marked if marked else 0
+        self.ban_share_label.config(text=f"Hidden by banned tags: {hidden} of {marked} codes ({share:.1f}%)")
+
 
 # --------------------
 # Main Execution
@@ -0,0 +1,101 @@
+"""
+Benchmark cover load latency and disk usage: cached JPEGs vs WebP thumbnails.
+
+Samples covers from the configured cover store (or synthesizes some if the
+cache is empty), writes one copy as-is and one transcoded to WebP into
+temporary per-file stores, then times read + decode + resize to the size
+PageOne displays.
+
+    python bench_covers.py [--samples N] [--quality Q]
+"""
+
+import os
+import time
+import random
+import argparse
+import tempfile
+from io import BytesIO
+
+from PIL import Image, ImageDraw
+
+import data_manager_json as dm
+from cover_store import DirectoryCoverStore, THUMBNAIL_SIZE, open_cover_store, transcode_to_webp
+
+
+def synthetic_covers(count, size=(350, 500)):
+    """Generate JPEG covers with enough structure to compress like real artwork."""
+    rng = random.Random(0)
+    covers = []
+    for _ in range(count):
+        image = Image.new("RGB", size, tuple(rng.randrange(256) for _ in range(3)))
+        draw = ImageDraw.Draw(image)
+        for _ in range(40):
+            x0, y0 = rng.randrange(size[0]), rng.randrange(size[1])
+            x1, y1 = x0 + rng.randrange(20, 200), y0 + rng.randrange(20, 200)
+            draw.ellipse((x0, y0, x1, y1), fill=tuple(rng.randrange(256) for _ in range(3)))
+        out = BytesIO()
+        image.save(out, format="JPEG", quality=90)
+        covers.append(out.getvalue())
+    return covers
+
+
+def sample_covers(count):
+    store = open_cover_store(dm.load_settings())
+    try:
+        codes = store.codes()
+        random.shuffle(codes)
+        covers = [store.get(code) for code in codes[:count]]
+    finally:
+        store.close()
+    return [bytes(data) for data in covers if data]
+
+
+def time_loads(store, codes):
+    """Average seconds per cover for read + decode + resize."""
+    start = time.perf_counter()
+    for code in codes:
+        Image.open(BytesIO(store.get(code))).resize(THUMBNAIL_SIZE)
+    return (time.perf_counter() - start) / max(len(codes), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare JPEG and WebP cover caches.")
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--quality", type=int, default=dm.DEFAULT_SETTINGS["covers"]["webp_quality"])
+    args = parser.parse_args()
+
+    covers = sample_covers(args.samples)
+    source = "cover cache"
+    if not covers:
+        covers = synthetic_covers(args.samples)
+        source = "synthetic covers"
+    codes = list(range(len(covers)))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        jpeg_store = DirectoryCoverStore(os.path.join(tmp, "jpeg"))
+        webp_store = DirectoryCoverStore(os.path.join(tmp, "webp"))
+
+        start = time.perf_counter()
+        for code, data in zip(codes, covers):
+            jpeg_store.put(code, data)
+            webp_store.put(code, transcode_to_webp(data, args.quality))
+        transcode_s = time.perf_counter() - start
+
+        jpeg_bytes = sum(jpeg_store.sizes().values())
+        webp_bytes = sum(webp_store.sizes().values())
+
+        # Warm the page cache once so both runs measure the same thing
+        time_loads(jpeg_store, codes)
+        time_loads(webp_store, codes)
+        jpeg_ms = time_loads(jpeg_store, codes) * 1000
+        webp_ms = time_loads(webp_store, codes) * 1000
+
+    print(f"{len(covers)} {source}, WebP quality {args.quality} (transcode took {transcode_s:.2f}s)")
+    print(f"{'format':<8}{'disk KiB':>12}{'avg KiB':>10}{'load ms':>10}")
+    print(f"{'JPEG':<8}{jpeg_bytes / 1024:>12.0f}{jpeg_bytes / 1024 / len(covers):>10.1f}{jpeg_ms:>10.3f}")
+    print(f"{'WebP':<8}{webp_bytes / 1024:>12.0f}{webp_bytes / 1024 / len(covers):>10.1f}{webp_ms:>10.3f}")
+    print(f"Disk: {jpeg_bytes / max(webp_bytes, 1):.1f}x smaller, load: {jpeg_ms / max(webp_ms, 1e-9):.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
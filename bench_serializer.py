@@ -0,0 +1,101 @@
+"""
+Benchmark saving and loading usable_codes.json: the old pretty-printed stdlib
+json path vs the serializer backend (orjson / msgspec if installed).
+
+Generates a synthetic file of --codes codes (500k by default) in a temporary
+directory, then times encode + write and read + decode into the in-memory
+structure each path produces (dicts of sets before, a CodeStore now).
+
+    python bench_serializer.py [--codes N]
+"""
+
+import os
+import json
+import time
+import random
+import argparse
+import tempfile
+
+import serializer
+from code_store import CodeStore
+
+
+def synthetic_records(count):
+    rng = random.Random(0)
+    codes = rng.sample(range(1, count * 2), count)
+    return {
+        str(code): {
+            "tags": rng.sample(range(1, 40000), rng.randrange(5, 25)),
+            "cover": f"https://t.example.net/galleries/{code * 7}/thumb.jpg" if code % 3 else "",
+            "visible": int(rng.random() < 0.9),
+        }
+        for code in codes
+    }
+
+
+def legacy_save(path, records):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(records, f, indent=2)
+
+
+def legacy_load(path):
+    with open(path, "r", encoding="utf-8") as f:
+        raw_dict = json.load(f)
+    final_dict = {}
+    for code_str, obj in raw_dict.items():
+        final_dict[int(code_str)] = {
+            "tags": set(obj.get("tags", [])),
+            "cover": obj.get("cover", ""),
+            "visible": obj.get("visible", 1)
+        }
+    return final_dict
+
+
+def fast_save(path, records):
+    with open(path, "wb") as f:
+        f.write(serializer.dumps(records))
+
+
+def fast_load(path):
+    return CodeStore.from_records(serializer.load_file(path))
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare usable_codes.json save/load paths.")
+    parser.add_argument("--codes", type=int, default=500_000)
+    args = parser.parse_args()
+
+    print(f"Generating {args.codes} synthetic codes...")
+    records = synthetic_records(args.codes)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, "legacy.json")
+        fast_path = os.path.join(tmp, "fast.json")
+
+        legacy_save_s, _ = timed(legacy_save, legacy_path, records)
+        fast_save_s, _ = timed(fast_save, fast_path, records)
+        legacy_load_s, legacy = timed(legacy_load, legacy_path)
+        fast_load_s, store = timed(fast_load, fast_path)
+
+        assert len(legacy) == len(store)
+        legacy_mb = os.path.getsize(legacy_path) / 1e6
+        fast_mb = os.path.getsize(fast_path) / 1e6
+
+    print(f"{'path':<28}{'file MB':>10}{'save s':>10}{'load s':>10}")
+    print(f"{'json indent=2 -> dicts':<28}{legacy_mb:>10.1f}{legacy_save_s:>10.2f}{legacy_load_s:>10.2f}")
+    print(f"{serializer.BACKEND + ' compact -> CodeStore':<28}{fast_mb:>10.1f}{fast_save_s:>10.2f}{fast_load_s:>10.2f}")
+    print(
+        f"Save {legacy_save_s / max(fast_save_s, 1e-9):.1f}x faster, "
+        f"load {legacy_load_s / max(fast_load_s, 1e-9):.1f}x faster, "
+        f"file {legacy_mb / max(fast_mb, 1e-9):.1f}x smaller"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,851 @@
+"""
+Columnar in-memory store for every code.
+
+Instead of {code: {"tags": set, "cover": str, "visible": int}} (hundreds of
+bytes per code), codes live in a few NumPy arrays:
+
+    codes        int64[n], sorted
+    visible      bool[n]
+    tag_offsets  int64[n + 1]; the tags of codes[i] are tag_ids[tag_offsets[i]:tag_offsets[i + 1]]
+    tag_ids      int32[total tags]
+    cover_ids    int32[n], index into the interned cover URL table (0 is "")
+
+CodeStore is a read-only Mapping, so `code in store`, `store[code]["tags"]`,
+`store.get(code, {}).get("cover")` and `store.items()` keep working; changes go
+through `set_visible`, `set_cover` and `put`. `visible_view()` is a live
+Mapping of the visible codes that replaces the separate master_list dict.
+
+Codes added or retagged by `put` sit in a small dict until MERGE_THRESHOLD of
+them accumulate, then are folded into the arrays in one pass.
+
+Tag filters are answered from an inverted index (TagPostings: tag id -> rows
+of the codes carrying it). A filter marks the rows of its tags in a bool mask
+and ANDs it with `visible`, touching only the codes that match; merges remap
+the index in linear time instead of rebuilding it.
+
+Banned tags (set_banned_tags) are applied locally: the store counts, per
+row, how many banned tags the code carries, and every visible-code query
+(visible_codes, visible_count, codes_with_any_tag, visible_view, is_visible)
+leaves out rows with a non-zero count. The stored visible flag is untouched,
+so unbanning brings the codes straight back. Banning or unbanning a tag only
+touches the rows in its postings, and the per-tag visible counts follow along.
+
+Random picks come from a VisibleSampler: the rows of the visible codes in an
+array plus a row -> position map, so a draw is O(1) per code and hiding or
+showing one code is an O(1) swap. It is built on first use and rebuilt after
+bulk changes (merges, bans, resets).
+
+A store can also be written to a binary snapshot (write_snapshot) and opened
+from it with mmap (open_snapshot): a header followed by the arrays above and
+the cover table, used in place without parsing, so opening costs the same at
+any size and pages are only read when touched. The snapshot records a
+signature of the data it was made from; dm regenerates it when that changes.
+"""
+
+import os
+import mmap
+import random
+import struct
+import threading
+from types import MappingProxyType
+from collections import namedtuple
+from collections.abc import Mapping
+from itertools import chain
+
+import numpy as np
+
+MERGE_THRESHOLD = 4096   # Pending puts folded into the arrays at once
+
+Columns = namedtuple("Columns", "codes visible tag_offsets tag_ids cover_ids")
+
+SNAPSHOT_MAGIC = b"SBCS"
+SNAPSHOT_VERSION = 2
+# magic, version, signature length, codes, tag ids, cover URLs, cover blob bytes, posting tag slots
+_SNAPSHOT_HEADER = struct.Struct("<4sIIQQQQQ")
+
+
+def _gather_rows(pool, starts, lengths):
+    """
+    Concatenate pool[starts[i]:starts[i] + lengths[i]] for every i.
+    Returns (offsets, values) in CSR form.
+    """
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    index = np.arange(offsets[-1], dtype=np.int64) - np.repeat(offsets[:-1] - starts, lengths)
+    return offsets, pool[index]
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+def _offsets_from_counts(counts):
+    offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return offsets
+
+
+class TagPostings:
+    """
+    Inverted tag index in CSR form: the rows (indexes into the store's arrays)
+    of the codes carrying tag t are rows[offsets[t]:offsets[t + 1]], in no
+    particular order. Immutable; a merge produces a remapped copy.
+    """
+
+    def __init__(self, offsets, rows):
+        self.offsets = offsets      # int64[max tag id + 2]
+        self.rows = rows            # int32[total tags]
+
+    @classmethod
+    def build(cls, tag_offsets, tag_ids):
+        row_of = np.repeat(np.arange(len(tag_offsets) - 1, dtype=np.int32), np.diff(tag_offsets))
+        order = np.argsort(tag_ids, kind="quicksort")
+        offsets = _offsets_from_counts(np.bincount(tag_ids, minlength=1))
+        return cls(offsets, row_of[order])
+
+    def rows_for(self, tag_ids):
+        """Rows of the codes carrying any of `tag_ids` (a row may repeat)."""
+        slots = len(self.offsets) - 1
+        parts = [
+            self.rows[self.offsets[t]:self.offsets[t + 1]]
+            for t in set(tag_ids) if 0 <= t < slots
+        ]
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int32)
+
+    def remapped(self, remap, new_rows, new_tags):
+        """
+        The index after a merge: `remap[old row]` is the row's new index, or -1
+        if it was replaced; (new_rows[i], new_tags[i]) are the tags of the rows
+        merged in. The old entries keep their order, so this is a gather and an
+        insert, linear in the index size with no sorting of the old entries.
+        """
+        rows = remap[self.rows]
+        counts = np.diff(self.offsets)
+        dropped = np.flatnonzero(rows < 0)
+        if len(dropped):
+            np.subtract.at(counts, np.searchsorted(self.offsets, dropped, side="right") - 1, 1)
+            rows = rows[rows >= 0]
+
+        order = np.argsort(new_tags, kind="stable")
+        new_tags, new_rows = new_tags[order], new_rows[order]
+        slots = max(len(counts), int(new_tags[-1]) + 1 if len(new_tags) else 0)
+        counts = np.concatenate((counts, np.zeros(slots - len(counts), dtype=counts.dtype)))
+
+        # Each new entry goes at the end of its tag's group
+        rows = np.insert(rows, _offsets_from_counts(counts)[new_tags + 1], new_rows)
+        offsets = _offsets_from_counts(counts + np.bincount(new_tags, minlength=slots))
+        return TagPostings(offsets, rows.astype(np.int32, copy=False))
+
+
+class CoverTable:
+    """
+    Interned cover URLs, id -> URL, with id 0 for "". URLs from a snapshot stay
+    encoded in the mapped file (`offsets` into `blob`) and are decoded on
+    access; URLs interned since are kept in a list. New URLs are deduplicated
+    among themselves only, so interning never decodes the mapped table.
+    """
+
+    def __init__(self, urls=("",), offsets=None, blob=b""):
+        if offsets is None:
+            offsets = np.zeros(1, dtype=np.int64)
+        self._offsets = offsets
+        self._blob = blob
+        self._base = len(offsets) - 1
+        self._extra = list(urls) if self._base == 0 else []
+        self._index = {url: i for i, url in enumerate(self._extra)} if self._base == 0 else {"": 0}
+
+    def __getitem__(self, i):
+        if i < self._base:
+            return bytes(self._blob[self._offsets[i]:self._offsets[i + 1]]).decode("utf-8")
+        return self._extra[i - self._base]
+
+    def __len__(self):
+        return self._base + len(self._extra)
+
+    def intern(self, url):
+        url = url or ""
+        i = self._index.get(url)
+        if i is None:
+            i = self._index[url] = len(self)
+            self._extra.append(url)
+        return i
+
+    def tolist(self):
+        offsets = self._offsets.tolist()
+        blob = bytes(self._blob)
+        return [blob[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(self._base)] + self._extra
+
+    def encode(self, count):
+        """(offsets int64[count + 1], blob bytes) for the first `count` URLs."""
+        extra = [url.encode("utf-8") for url in self._extra[:max(count - self._base, 0)]]
+        base = min(count, self._base)
+        lengths = np.fromiter(map(len, extra), dtype=np.int64, count=len(extra))
+        offsets = np.concatenate((self._offsets[:base + 1], self._offsets[base] + np.cumsum(lengths)))
+        return offsets.astype(np.int64), bytes(self._blob[:self._offsets[base]]) + b"".join(extra)
+
+    def copy(self):
+        """A copy whose length later interning doesn't change (it shares the mapped part)."""
+        table = CoverTable(offsets=self._offsets, blob=self._blob)
+        table._extra = list(self._extra)
+        table._index = dict(self._index)
+        return table
+
+    def nbytes(self):
+        return self._offsets.nbytes + len(self._blob) + sum(len(url) + 49 for url in self._extra)
+
+
+class VisibleSampler:
+    """
+    The rows of the visible codes, members[:size], with pos[row] giving each
+    row's index in members (-1 if absent): O(1) add, remove and random draw.
+
+    For no-repeat draws, members[:unseen] are the rows not yet drawn in the
+    current cycle; a draw swaps its pick to the end of that region, which
+    builds a shuffled permutation one step at a time. A new cycle starts
+    when every row has been drawn.
+    """
+
+    def __init__(self, shown):
+        rows = np.flatnonzero(shown).astype(np.int32)
+        self.members = np.empty(len(shown), dtype=np.int32)
+        self.members[:len(rows)] = rows
+        self.pos = np.full(len(shown), -1, dtype=np.int32)
+        self.pos[rows] = np.arange(len(rows), dtype=np.int32)
+        self.size = len(rows)
+        self.unseen = self.size
+
+    def _swap(self, i, j):
+        members, pos = self.members, self.pos
+        a, b = members[i], members[j]
+        members[i], members[j] = b, a
+        pos[a], pos[b] = j, i
+
+    def add(self, row):
+        if self.pos[row] >= 0:
+            return
+        self.members[self.size] = row
+        self.pos[row] = self.size
+        # A newly shown code has not been drawn in this cycle
+        self._swap(self.size, self.unseen)
+        self.size += 1
+        self.unseen += 1
+
+    def remove(self, row):
+        i = int(self.pos[row])
+        if i < 0:
+            return
+        if i < self.unseen:
+            self._swap(i, self.unseen - 1)
+            i = self.unseen - 1
+            self.unseen -= 1
+        self._swap(i, self.size - 1)
+        self.pos[row] = -1
+        self.size -= 1
+
+    def draw(self, k, no_repeat=False):
+        """Up to `k` distinct rows, uniformly at random."""
+        k = min(k, self.size)
+        if not no_repeat:
+            return self.members[random.sample(range(self.size), k)]
+        picks = []
+        for _ in range(k):
+            if self.unseen == 0:
+                # New cycle; the rows picked in this call count as drawn in it
+                for j, row in enumerate(picks):
+                    self._swap(int(self.pos[row]), self.size - 1 - j)
+                self.unseen = self.size - len(picks)
+            i = random.randrange(self.unseen)
+            self._swap(i, self.unseen - 1)
+            self.unseen -= 1
+            picks.append(self.members[self.unseen])
+            if len(picks) == self.size:
+                break
+        return np.array(picks, dtype=np.int32)
+
+
+class CodeStore(Mapping):
+
+    def __init__(self, columns, covers, mapping=None, postings=None):
+        # (Columns, ban counts, pending puts), swapped as one so lock-free readers
+        # never pair the arrays of one merge with the counts or puts of another
+        self._state = (columns, None, {})
+        self.covers = covers if isinstance(covers, CoverTable) else CoverTable(covers)
+        self._lock = threading.RLock()
+        self._mapping = mapping                                # mmap backing the arrays, if opened from a snapshot
+        self._postings = postings                              # TagPostings over _cols, built on first use
+        self._banned = frozenset()                             # Banned tag ids
+        self._sampler = None                                   # VisibleSampler over _cols, built on first use
+        self._tag_counts = None                                # int64[slots]: visible codes per tag, built on first use
+        self.version = 0                                       # Bumped by every change to codes, tags or visibility
+
+    @property
+    def _cols(self):
+        return self._state[0]
+
+    @property
+    def _ban_count(self):
+        """int32[n]: banned tags per row of _cols, None if no bans."""
+        return self._state[1]
+
+    @property
+    def _pending(self):
+        """code -> (tags tuple, cover id, visible)."""
+        return self._state[2]
+
+    # ---- construction ----
+
+    @classmethod
+    def empty(cls):
+        return cls.from_dict({})
+
+    @classmethod
+    def from_dict(cls, codes_dict):
+        """Build a store from {code: {"tags": iterable, "cover": str, "visible": int}}."""
+        codes = np.fromiter(codes_dict.keys(), dtype=np.int64, count=len(codes_dict))
+        return cls._build(codes, list(codes_dict.values()))
+
+    @classmethod
+    def from_records(cls, records):
+        """
+        Build a store straight from decoded usable_codes.json:
+        {"code": {"tags": [...], "cover": str, "visible": int}} with string keys.
+        """
+        codes = np.fromiter(map(int, records.keys()), dtype=np.int64, count=len(records))
+        return cls._build(codes, list(records.values()))
+
+    @classmethod
+    def _build(cls, codes, values):
+        covers = [""]
+        cover_index = {"": 0}
+
+        def cover_id(url):
+            url = url or ""
+            if url not in cover_index:
+                cover_index[url] = len(covers)
+                covers.append(url)
+            return cover_index[url]
+
+        n = len(values)
+        order = np.argsort(codes, kind="stable")
+        visible = np.fromiter((obj.get("visible", 1) == 1 for obj in values), dtype=bool, count=n)[order]
+        cover_ids = np.fromiter((cover_id(obj.get("cover")) for obj in values), dtype=np.int32, count=n)[order]
+        lengths = np.fromiter((len(obj.get("tags", ())) for obj in values), dtype=np.int64, count=n)
+        starts = np.zeros(n, dtype=np.int64)
+        np.cumsum(lengths[:-1], out=starts[1:])
+        tag_pool = np.fromiter(
+            chain.from_iterable(obj.get("tags", ()) for obj in values),
+            dtype=np.int32, count=int(lengths.sum())
+        )
+        tag_offsets, tag_ids = _gather_rows(tag_pool, starts[order], lengths[order])
+        return cls(Columns(codes[order], visible, tag_offsets, tag_ids, cover_ids), covers)
+
+    def to_records(self):
+        """The usable_codes.json shape: {"code": {"tags": [...], "cover": str, "visible": int}}."""
+        cols = self.columns()
+        tag_ids = cols.tag_ids.tolist()
+        offsets = cols.tag_offsets.tolist()
+        covers = self.covers.tolist()
+        return {
+            str(code): {"tags": tag_ids[offsets[i]:offsets[i + 1]], "cover": covers[cover_id], "visible": int(visible)}
+            for i, (code, visible, cover_id) in enumerate(zip(
+                cols.codes.tolist(), cols.visible.tolist(), cols.cover_ids.tolist()
+            ))
+        }
+
+    # ---- Mapping interface ----
+
+    def _row(self, cols, code):
+        """Index of `code` in `cols`, or -1."""
+        i = int(np.searchsorted(cols.codes, code))
+        if i < len(cols.codes) and cols.codes[i] == code:
+            return i
+        return -1
+
+    def _lookup(self, code):
+        """(tags, cover id, visible) for `code`, or None."""
+        cols, _, pending = self._state
+        pending = pending.get(code)
+        if pending is not None:
+            return pending
+        i = self._row(cols, code)
+        if i < 0:
+            return None
+        tags = cols.tag_ids[cols.tag_offsets[i]:cols.tag_offsets[i + 1]].tolist()
+        return tags, int(cols.cover_ids[i]), int(cols.visible[i])
+
+    def __getitem__(self, code):
+        found = self._lookup(code)
+        if found is None:
+            raise KeyError(code)
+        tags, cover_id, visible = found
+        return MappingProxyType({"tags": frozenset(tags), "cover": self.covers[cover_id], "visible": visible})
+
+    def __contains__(self, code):
+        cols, _, pending = self._state
+        return code in pending or self._row(cols, code) >= 0
+
+    def __iter__(self):
+        return iter(self.all_codes().tolist())
+
+    def __len__(self):
+        cols, _, pending = self._state
+        return len(cols.codes) + len(pending) - int(np.count_nonzero(self._shadowed(cols, pending)))
+
+    # ---- single-field access ----
+
+    def tags(self, code):
+        found = self._lookup(code)
+        return frozenset(found[0]) if found else frozenset()
+
+    def cover(self, code):
+        found = self._lookup(code)
+        return self.covers[found[1]] if found else ""
+
+    def is_visible(self, code):
+        """True if `code` is marked visible and carries no banned tag."""
+        cols, ban_count, pending = self._state
+        pending = pending.get(code)
+        if pending is not None:
+            return pending[2] == 1 and self._banned.isdisjoint(pending[0])
+        i = self._row(cols, code)
+        return i >= 0 and bool(cols.visible[i]) and (ban_count is None or ban_count[i] == 0)
+
+    # ---- changes ----
+
+    def _cover_id(self, url):
+        with self._lock:
+            return self.covers.intern(url)
+
+    def set_visible(self, code, visible):
+        with self._lock:
+            self.version += 1
+            pending = self._pending.get(code)
+            if pending is not None:
+                self._pending[code] = (pending[0], pending[1], int(visible))
+                return
+            i = self._row(self._cols, code)
+            if i < 0:
+                raise KeyError(code)
+            cols = self._cols
+            was_shown = bool(cols.visible[i]) and (self._ban_count is None or self._ban_count[i] == 0)
+            cols.visible[i] = visible == 1
+            shown = visible == 1 and (self._ban_count is None or self._ban_count[i] == 0)
+            if shown == was_shown:
+                return
+            if self._sampler is not None:
+                if shown:
+                    self._sampler.add(i)
+                else:
+                    self._sampler.remove(i)
+            if self._tag_counts is not None:
+                # A code lists each tag once
+                self._tag_counts[cols.tag_ids[cols.tag_offsets[i]:cols.tag_offsets[i + 1]]] += 1 if shown else -1
+
+    def set_all_visible(self):
+        """Mark every code visible."""
+        with self._lock:
+            self.version += 1
+            self._cols.visible[:] = True
+            self._sampler = None
+            self._tag_counts = None
+            for code, (tags, cover_id, _) in self._pending.items():
+                self._pending[code] = (tags, cover_id, 1)
+
+    def set_cover(self, code, url):
+        cover_id = self._cover_id(url)
+        with self._lock:
+            pending = self._pending.get(code)
+            if pending is not None:
+                self._pending[code] = (pending[0], cover_id, pending[2])
+                return
+            i = self._row(self._cols, code)
+            if i < 0:
+                raise KeyError(code)
+            self._cols.cover_ids[i] = cover_id
+
+    def put(self, code, tags, cover=None, visible=None):
+        """
+        Add `code`, or replace its tags. `cover` and `visible` default to the
+        current values for a known code, and to "" and 1 for a new one.
+        """
+        with self._lock:
+            current = self._lookup(code)
+            if cover is None:
+                cover_id = current[1] if current else 0
+            else:
+                cover_id = self._cover_id(cover)
+            if visible is None:
+                visible = current[2] if current else 1
+            self._pending[code] = (tuple(tags), cover_id, int(visible))
+            self.version += 1
+            if len(self._pending) >= MERGE_THRESHOLD:
+                self.merge()
+
+    def merge(self):
+        """Fold pending puts into the arrays."""
+        with self._lock:
+            pending = self._pending
+            if not pending:
+                return
+            cols = self._cols
+            keep = ~self._shadowed(cols, pending)
+
+            new_codes = np.fromiter(pending.keys(), dtype=np.int64, count=len(pending))
+            new_tags = [entry[0] for entry in pending.values()]
+            new_lengths = np.fromiter(map(len, new_tags), dtype=np.int64, count=len(pending))
+            new_starts = len(cols.tag_ids) + np.concatenate(([0], np.cumsum(new_lengths)[:-1])).astype(np.int64)
+            pool = np.concatenate((
+                cols.tag_ids,
+                np.fromiter(chain.from_iterable(new_tags), dtype=np.int32, count=int(new_lengths.sum()))
+            ))
+
+            kept_rows = np.flatnonzero(keep)
+            codes = np.concatenate((cols.codes[kept_rows], new_codes))
+            order = np.argsort(codes, kind="stable")
+            starts = np.concatenate((cols.tag_offsets[:-1][keep], new_starts))[order]
+            lengths = np.concatenate((np.diff(cols.tag_offsets)[keep], new_lengths))[order]
+            tag_offsets, tag_ids = _gather_rows(pool, starts, lengths)
+            visible = np.concatenate((
+                cols.visible[keep],
+                np.fromiter((entry[2] == 1 for entry in pending.values()), dtype=bool, count=len(pending))
+            ))[order]
+            cover_ids = np.concatenate((
+                cols.cover_ids[keep],
+                np.fromiter((entry[1] for entry in pending.values()), dtype=np.int32, count=len(pending))
+            ))[order]
+
+            if self._postings is not None:
+                new_row = np.empty(len(order), dtype=np.int32)
+                new_row[order] = np.arange(len(order), dtype=np.int32)
+                remap = np.full(len(cols.codes), -1, dtype=np.int32)
+                remap[kept_rows] = new_row[:len(kept_rows)]
+                self._postings = self._postings.remapped(
+                    remap,
+                    np.repeat(new_row[len(kept_rows):], new_lengths),
+                    pool[len(cols.tag_ids):]
+                )
+
+            merged = Columns(codes[order], visible, tag_offsets, tag_ids.astype(np.int32), cover_ids)
+            ban_count = self._count_bans(merged, self._banned) if self._banned else None
+            self._state = (merged, ban_count, {})
+            self._sampler = None
+            self._tag_counts = None
+
+    def _shadowed(self, cols, pending):
+        """Mask of rows in `cols` replaced by a pending put."""
+        if not pending:
+            return np.zeros(len(cols.codes), dtype=bool)
+        return np.isin(cols.codes, np.fromiter(pending.keys(), dtype=np.int64, count=len(pending)))
+
+    # ---- vectorized queries ----
+
+    def columns(self):
+        """The arrays with pending puts folded in. Do not modify them."""
+        self.merge()
+        return self._cols
+
+    def all_codes(self):
+        return self.columns().codes
+
+    def _shown(self, cols):
+        """Mask of the rows of `cols` that are visible and not banned."""
+        if self._ban_count is None:
+            return cols.visible
+        return cols.visible & (self._ban_count == 0)
+
+    def visible_codes(self):
+        with self._lock:
+            cols = self.columns()
+            return cols.codes[self._shown(cols)]
+
+    def set_hidden(self, codes):
+        """Mark exactly `codes` hidden and every other code visible."""
+        with self._lock:
+            self.merge()
+            self._cols.visible[:] = ~np.isin(self._cols.codes, np.asarray(list(codes), dtype=np.int64))
+            self._sampler = None
+            self._tag_counts = None
+            self.version += 1
+
+    def visible_count(self):
+        with self._lock:
+            return int(np.count_nonzero(self._shown(self.columns())))
+
+    def visible_tag_counts(self):
+        """
+        int64[max tag id + 1]: how many visible codes carry each tag. Built
+        from the tag index on first use, then kept up to date by set_visible
+        and set_banned_tags.
+        Do not modify it.
+        """
+        with self._lock:
+            cols = self.columns()
+            if self._tag_counts is None:
+                postings = self.tag_postings()
+                running = np.zeros(len(postings.rows) + 1, dtype=np.int64)
+                np.cumsum(self._shown(cols)[postings.rows], out=running[1:])
+                self._tag_counts = running[postings.offsets[1:]] - running[postings.offsets[:-1]]
+            return self._tag_counts
+
+    def visible_mask(self):
+        """Bool mask over the rows of columns(): visible and not banned."""
+        with self._lock:
+            return self._shown(self.columns()).copy()
+
+    def ban_hidden_count(self):
+        """Codes marked visible that are hidden because they carry a banned tag."""
+        with self._lock:
+            cols = self.columns()
+            if self._ban_count is None:
+                return 0
+            return int(np.count_nonzero(cols.visible & (self._ban_count > 0)))
+
+    # ---- banned tags ----
+
+    def _count_bans(self, cols, tag_ids):
+        """Banned tags per row of `cols`, counting `tag_ids`, read from the tag column."""
+        hits = np.zeros(len(cols.tag_ids) + 1, dtype=np.int32)
+        np.cumsum(np.isin(cols.tag_ids, np.fromiter(tag_ids, dtype=np.int32, count=len(tag_ids))), out=hits[1:])
+        return hits[cols.tag_offsets[1:]] - hits[cols.tag_offsets[:-1]]
+
+    def set_banned_tags(self, tag_ids):
+        """
+        Hide every code carrying one of `tag_ids` from the visible-code queries,
+        and bring back those whose tags are no longer banned. Only the rows of
+        the tags added to or dropped from the ban list are touched.
+        """
+        with self._lock:
+            banned = frozenset(tag_ids)
+            added, removed = banned - self._banned, self._banned - banned
+            if not added and not removed:
+                return
+            self.merge()
+            visible = self._cols.visible
+            if not banned:
+                self._adjust_tag_counts(np.flatnonzero(visible & (self._ban_count > 0)), 1)
+                self._state = (self._cols, None, self._pending)
+            elif self._ban_count is None:
+                self._state = (self._cols, self._count_bans(self._cols, banned), self._pending)
+                self._adjust_tag_counts(np.flatnonzero(visible & (self._ban_count > 0)), -1)
+            else:
+                postings = self.tag_postings()
+                for tag_id in added:
+                    rows = postings.rows_for((tag_id,))
+                    self._adjust_tag_counts(rows[visible[rows] & (self._ban_count[rows] == 0)], -1)
+                    self._ban_count[rows] += 1
+                for tag_id in removed:
+                    rows = postings.rows_for((tag_id,))
+                    self._ban_count[rows] -= 1
+                    self._adjust_tag_counts(rows[visible[rows] & (self._ban_count[rows] == 0)], 1)
+            self._banned = banned
+            self._sampler = None
+            self.version += 1
+
+    def _adjust_tag_counts(self, rows, sign):
+        """Add (sign 1) or take (sign -1) the tags of `rows` to or from the visible tag counts."""
+        if self._tag_counts is None or len(rows) == 0:
+            return
+        cols = self._cols
+        starts = cols.tag_offsets[rows]
+        _, tags = _gather_rows(cols.tag_ids, starts, cols.tag_offsets[rows + 1] - starts)
+        self._tag_counts += sign * np.bincount(tags, minlength=len(self._tag_counts))
+
+    def banned_tags(self):
+        return self._banned
+
+    def ban_impact(self, tag_id):
+        """
+        For a tag that isn't banned, how many visible codes banning it would
+        hide; for a banned one, how many codes unbanning it would bring back.
+        Read from the visible tag counts, or the tag's postings if banned.
+        """
+        with self._lock:
+            if tag_id not in self._banned:
+                counts = self.visible_tag_counts()
+                return int(counts[tag_id]) if 0 <= tag_id < len(counts) else 0
+            rows = self.tag_postings().rows_for((tag_id,))
+            return int(np.count_nonzero(self._cols.visible[rows] & (self._ban_count[rows] == 1)))
+
+    def tag_postings(self):
+        """The inverted tag index over columns(), building it if needed."""
+        with self._lock:
+            cols = self.columns()
+            if self._postings is None:
+                self._postings = TagPostings.build(cols.tag_offsets, cols.tag_ids)
+            return self._postings
+
+    def rows_with_any_tag(self, tag_ids, visible_only=True):
+        """Bool mask over the rows of columns(): codes carrying at least one of `tag_ids`."""
+        with self._lock:
+            postings = self.tag_postings()
+            cols = self._cols
+            shown = self._shown(cols) if visible_only else None
+        mask = np.zeros(len(cols.codes), dtype=bool)
+        mask[postings.rows_for(tag_ids)] = True
+        if visible_only:
+            mask &= shown
+        return mask
+
+    def codes_with_any_tag(self, tag_ids, visible_only=True):
+        """Codes carrying at least one of `tag_ids`, as a sorted array."""
+        with self._lock:
+            cols = self.columns()
+            mask = self.rows_with_any_tag(tag_ids, visible_only)
+        return cols.codes[mask]
+
+    def sample_visible(self, k, tag_ids=None, no_repeat=False, where=None):
+        """
+        Up to `k` distinct random visible codes, as a list of ints. With
+        `tag_ids`, only codes carrying one of them; with `where` (a bool mask
+        over the rows of columns(), e.g. from a tag_query plan), only those
+        rows; otherwise, with `no_repeat`, no code comes up twice until every
+        visible code has.
+        """
+        with self._lock:
+            cols = self.columns()
+            if tag_ids or where is not None:
+                mask = self.rows_with_any_tag(tag_ids) if tag_ids else self._shown(cols)
+                if where is not None:
+                    mask = mask & where
+                rows = np.flatnonzero(mask)
+                rows = rows[random.sample(range(len(rows)), min(k, len(rows)))]
+            else:
+                if self._sampler is None:
+                    self._sampler = VisibleSampler(self._shown(cols))
+                rows = self._sampler.draw(k, no_repeat)
+            return cols.codes[rows].tolist()
+
+    def visible_view(self):
+        return VisibleCodes(self)
+
+    def memory_bytes(self):
+        """Approximate bytes held (or mapped) by the arrays and the cover table."""
+        return sum(array.nbytes for array in self._cols) + self.covers.nbytes()
+
+    # ---- binary snapshot ----
+
+    def freeze(self):
+        """
+        A copy that later changes to this store don't affect, cheap enough to take
+        on the Tk thread: visible and cover_ids are copied (they change in place),
+        the other arrays are shared (they are only ever replaced).
+        """
+        with self._lock:
+            cols = self.columns()
+            cols = cols._replace(visible=cols.visible.copy(), cover_ids=cols.cover_ids.copy())
+            return CodeStore(cols, self.covers.copy(), mapping=self._mapping, postings=self._postings)
+
+    def write_snapshot(self, path, signature):
+        """
+        Write the store to the binary snapshot `path` (via a fsynced temp file),
+        recording `signature` for open_snapshot to check. Call it on a freeze()
+        copy if the store may change meanwhile.
+        """
+        postings = self.tag_postings()
+        cols = self.columns()
+        cover_count = len(self.covers)
+        cover_offsets, cover_blob = self.covers.encode(cover_count)
+        signature = signature.encode("utf-8")
+
+        sections = [
+            cols.codes.astype(np.int64, copy=False),
+            cols.tag_offsets.astype(np.int64, copy=False),
+            cover_offsets,
+            cols.tag_ids.astype(np.int32, copy=False),
+            cols.cover_ids.astype(np.int32, copy=False),
+            cols.visible.astype(np.uint8),
+            postings.offsets.astype(np.int64, copy=False),
+            postings.rows.astype(np.int32, copy=False),
+            cover_blob,
+        ]
+        header = _SNAPSHOT_HEADER.pack(
+            SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(signature),
+            len(cols.codes), len(cols.tag_ids), cover_count, len(cover_blob), len(postings.offsets) - 1
+        )
+        tmp_path = path + ".tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(header + signature)
+                for section in sections:
+                    f.write(b"\0" * (_align(f.tell()) - f.tell()))
+                    f.write(memoryview(section).cast("B") if not isinstance(section, bytes) else section)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error: Could not write code snapshot {path}. {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    @classmethod
+    def open_snapshot(cls, path, signature):
+        """
+        Open the binary snapshot at `path` with mmap. Returns None if it is
+        missing, damaged, or was written for a different `signature`.
+        The arrays are copy-on-write views of the map: changes stay in memory.
+        """
+        try:
+            with open(path, "rb") as f:
+                mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        except (OSError, ValueError):
+            return None
+
+        try:
+            (magic, version, sig_len, n_codes, n_tags, n_covers, blob_len,
+             n_slots) = _SNAPSHOT_HEADER.unpack_from(mapping, 0)
+            offset = _SNAPSHOT_HEADER.size
+            if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+                raise ValueError("not a code snapshot")
+            if bytes(mapping[offset:offset + sig_len]).decode("utf-8") != signature:
+                raise ValueError("stale")
+            offset += sig_len
+
+            def section(dtype, count):
+                nonlocal offset
+                offset = _align(offset)
+                array = np.frombuffer(mapping, dtype=dtype, count=count, offset=offset)
+                offset += array.nbytes
+                return array
+
+            codes = section(np.int64, n_codes)
+            tag_offsets = section(np.int64, n_codes + 1)
+            cover_offsets = section(np.int64, n_covers + 1)
+            tag_ids = section(np.int32, n_tags)
+            cover_ids = section(np.int32, n_codes)
+            visible = section(np.bool_, n_codes)
+            posting_offsets = section(np.int64, n_slots + 1)
+            posting_rows = section(np.int32, n_tags)
+            offset = _align(offset)
+            if offset + blob_len > len(mapping):
+                raise ValueError("truncated")
+            blob = memoryview(mapping)[offset:offset + blob_len]
+        except (ValueError, struct.error):
+            mapping.close()
+            return None
+
+        covers = CoverTable(offsets=cover_offsets, blob=blob)
+        return cls(
+            Columns(codes, visible, tag_offsets, tag_ids, cover_ids), covers,
+            mapping=mapping, postings=TagPostings(posting_offsets, posting_rows)
+        )
+
+
+class VisibleCodes(Mapping):
+    """Live read-only view of the visible codes of a CodeStore."""
+
+    def __init__(self, store):
+        self.store = store
+
+    def __getitem__(self, code):
+        if not self.store.is_visible(code):
+            raise KeyError(code)
+        return self.store[code]
+
+    def __contains__(self, code):
+        return self.store.is_visible(code)
+
+    def __iter__(self):
+        return iter(self.store.visible_codes().tolist())
+
+    def __len__(self):
+        return self.store.visible_count()
@@ -0,0 +1,10 @@
+"""
+Cover request priorities, most urgent first.
+
+The CoverLoader serves queued requests in this order (a request waiting long
+enough is served regardless). Defined here once for Applic and cover_warmup.
+"""
+
+PRIORITY_ON_SCREEN = 0   # Covers the user is looking at right now
+PRIORITY_PREFETCH = 1    # Covers we expect to be shown next
+PRIORITY_BULK = 2        # Scrapes and warm-up jobs
@@ -0,0 +1,577 @@
+"""
+Cover storage backends.
+
+Two interchangeable stores share the same small interface
+(get / put / remove / __contains__ / codes / sizes):
+
+  - DirectoryCoverStore: the classic layout, one "<code>.jpg" (or ".webp") per cover in COVERS_DIR.
+  - PackedCoverStore: a single append-only data file plus a fixed-width offset index.
+    The data file is read through mmap, so loading a thumbnail is one slice
+    with no open() or stat() per cover.
+
+CoverStoreManager wraps either store with a size cap, least-recently-viewed
+eviction and garbage collection of covers nobody can see any more.
+
+Run this module directly to migrate an existing cover directory into the packed
+store, to compact the packed store, or to convert an existing cache to WebP:
+
+    python cover_store.py migrate [--remove]
+    python cover_store.py compact
+    python cover_store.py webp [--quality Q]
+"""
+
+import os
+import time
+import mmap
+import struct
+import logging
+import argparse
+import threading
+from io import BytesIO
+from collections import OrderedDict
+
+from PIL import Image
+
+import data_manager_json as dm
+
+PACK_DATA_FILE = "covers.pack"
+PACK_INDEX_FILE = "covers.idx"
+
+# Covers are only ever displayed at this size or smaller
+THUMBNAIL_SIZE = (150, 225)
+
+# One index record per put/remove: code (int64), offset (uint64), length (uint32).
+# A length of 0 is a tombstone marking the code as removed.
+_INDEX_RECORD = struct.Struct("<qQI")
+
+# The garbage-collection pass compacts a packed store once more than
+# this share of its data file is superseded or removed covers
+COMPACT_DEAD_FRACTION = 0.5
+
+
+def is_webp(data):
+    """True if `data` is a WebP image (RIFF container with a WEBP tag)."""
+    return data[:4] == b"RIFF" and data[8:12] == b"WEBP"
+
+
+def transcode_to_webp(data, quality):
+    """
+    Shrink cover bytes to at most THUMBNAIL_SIZE and re-encode them as WebP.
+    Returns the original bytes if they are already WebP or can't be decoded.
+    """
+    if is_webp(data):
+        return data
+    try:
+        image = Image.open(BytesIO(data))
+        image.thumbnail(THUMBNAIL_SIZE, Image.LANCZOS)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGB")
+        out = BytesIO()
+        image.save(out, format="WEBP", quality=quality, method=4)
+        return out.getvalue()
+    except Exception as e:
+        logging.error(f"Error transcoding cover to WebP: {e}")
+        return data
+
+
+def convert_store_to_webp(store, quality):
+    """
+    Batch-convert every cached cover in `store` (a store or CoverStoreManager) to WebP.
+    Returns (covers converted, bytes before, bytes after).
+    """
+    converted = 0
+    before = after = 0
+    for code in store.codes():
+        data = store.get(code)
+        if not data or is_webp(data):
+            continue
+        webp = transcode_to_webp(data, quality)
+        if webp is data:
+            continue
+        store.put(code, webp)
+        converted += 1
+        before += len(data)
+        after += len(webp)
+    logging.info(f"Converted {converted} covers to WebP: {before} -> {after} bytes.")
+    return converted, before, after
+
+
+class DirectoryCoverStore:
+    """
+    One file per cover inside `directory`, named "<code>.jpg"
+    (or "<code>.webp" for covers transcoded to WebP).
+    """
+
+    EXTENSIONS = (".webp", ".jpg")
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, code, ext=".jpg"):
+        return os.path.join(self.directory, f"{code}{ext}")
+
+    def get(self, code):
+        """Return the raw image bytes for `code`, or None if it isn't cached."""
+        for ext in self.EXTENSIONS:
+            try:
+                with open(self._path(code, ext), "rb") as f:
+                    return f.read()
+            except FileNotFoundError:
+                continue
+        return None
+
+    def put(self, code, data):
+        """Store the raw image bytes for `code`, replacing any previous cover."""
+        ext = ".webp" if is_webp(data) else ".jpg"
+        with open(self._path(code, ext), "wb") as f:
+            f.write(data)
+        # Don't leave the other format behind to shadow or duplicate this one
+        stale = ".jpg" if ext == ".webp" else ".webp"
+        try:
+            os.remove(self._path(code, stale))
+        except FileNotFoundError:
+            pass
+
+    def remove(self, code):
+        """Delete the cover for `code` if present."""
+        for ext in self.EXTENSIONS:
+            try:
+                os.remove(self._path(code, ext))
+            except FileNotFoundError:
+                pass
+
+    def __contains__(self, code):
+        return any(os.path.exists(self._path(code, ext)) for ext in self.EXTENSIONS)
+
+    def _scan(self):
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                stem, ext = os.path.splitext(entry.name)
+                if ext.lower() in self.EXTENSIONS and stem.isdigit() and entry.is_file():
+                    yield int(stem), entry
+
+    def codes(self):
+        """Return the list of codes that currently have a cached cover."""
+        return list({code for code, _ in self._scan()})
+
+    def sizes(self):
+        """Return {code: size in bytes} for every cached cover."""
+        found = {}
+        for code, entry in self._scan():
+            found[code] = found.get(code, 0) + entry.stat().st_size
+        return found
+
+    def close(self):
+        pass
+
+
+class PackedCoverStore:
+    """
+    Append-only packed cover store.
+
+    `covers.pack` holds the image bytes back to back, `covers.idx` holds one
+    fixed-width record per write. The index is replayed into memory on open,
+    later records win. Removing a cover only appends a tombstone; the space is
+    reclaimed by `compact()`.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.data_path = os.path.join(directory, PACK_DATA_FILE)
+        self.index_path = os.path.join(directory, PACK_INDEX_FILE)
+
+        self.index = {}                  # code -> (offset, length)
+        self._lock = threading.Lock()
+        self._open()
+
+    # ---- open / close ----
+
+    def _open(self):
+        self.index = self._read_index()
+        self._live_bytes = sum(length for _, length in self.index.values())
+
+        # Append handles stay open for the lifetime of the store
+        self._data_file = open(self.data_path, "ab")
+        self._index_file = open(self.index_path, "ab")
+        self._data_size = self._data_file.seek(0, os.SEEK_END)
+
+        self._map = None
+        self._mapped_size = 0
+        self._reader = open(self.data_path, "rb")
+        self._remap()
+
+    def _read_index(self):
+        index = {}
+        if not os.path.exists(self.index_path):
+            return index
+        with open(self.index_path, "rb") as f:
+            raw = f.read()
+
+        # Ignore a torn trailing record left by an interrupted write
+        usable = len(raw) - (len(raw) % _INDEX_RECORD.size)
+        for code, offset, length in _INDEX_RECORD.iter_unpack(raw[:usable]):
+            if length:
+                index[code] = (offset, length)
+            else:
+                index.pop(code, None)
+        return index
+
+    def _remap(self):
+        """Map the data file as it stands now (mmap cannot map an empty file)."""
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._mapped_size = self._data_size
+        if self._data_size:
+            self._map = mmap.mmap(self._reader.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            self._reader.close()
+            self._data_file.close()
+            self._index_file.close()
+
+    # ---- store interface ----
+
+    def get(self, code):
+        """Return the raw image bytes for `code`, or None if it isn't cached."""
+        with self._lock:
+            # Looked up under the lock: a compaction moves every cover
+            entry = self.index.get(code)
+            if entry is None:
+                return None
+            offset, length = entry
+            if offset + length > self._mapped_size:
+                # Written since the last mapping; our own size bookkeeping tells us, no stat needed
+                self._remap()
+            return self._map[offset:offset + length]
+
+    def put(self, code, data):
+        """Append the raw image bytes for `code`, superseding any previous cover."""
+        if not data:
+            return
+        with self._lock:
+            offset = self._data_size
+            self._data_file.write(data)
+            self._data_file.flush()
+            self._data_size += len(data)
+
+            # Data first, then the index record that points at it
+            self._index_file.write(_INDEX_RECORD.pack(code, offset, len(data)))
+            self._index_file.flush()
+            _, old_length = self.index.get(code, (0, 0))
+            self.index[code] = (offset, len(data))
+            self._live_bytes += len(data) - old_length
+
+    def remove(self, code):
+        """Forget the cover for `code` (space is reclaimed on compaction)."""
+        with self._lock:
+            entry = self.index.pop(code, None)
+            if entry is None:
+                return
+            self._live_bytes -= entry[1]
+            self._index_file.write(_INDEX_RECORD.pack(code, 0, 0))
+            self._index_file.flush()
+
+    def __contains__(self, code):
+        return code in self.index
+
+    def codes(self):
+        """Return the list of codes that currently have a cached cover."""
+        with self._lock:
+            return list(self.index.keys())
+
+    def sizes(self):
+        """Return {code: size in bytes} for every cached cover."""
+        with self._lock:
+            return {code: length for code, (_, length) in self.index.items()}
+
+    # ---- maintenance ----
+
+    def live_bytes(self):
+        """Total size of the live covers, kept up to date by put and remove."""
+        return self._live_bytes
+
+    def data_bytes(self):
+        """Size of the data file, superseded and removed covers included."""
+        return self._data_size
+
+    def compact(self):
+        """
+        Rewrite the data and index files with only the live covers, dropping
+        superseded and removed entries. Returns the number of bytes reclaimed.
+        """
+        with self._lock:
+            before = self._data_size
+            if self._data_size > self._mapped_size:
+                self._remap()
+            tmp_data = self.data_path + ".tmp"
+            tmp_index = self.index_path + ".tmp"
+
+            new_index = {}
+            with open(tmp_data, "wb") as data_out, open(tmp_index, "wb") as index_out:
+                offset = 0
+                # Keep covers in code order so neighbouring codes sit next to each other
+                for code in sorted(self.index):
+                    old_offset, length = self.index[code]
+                    data_out.write(self._map[old_offset:old_offset + length])
+                    index_out.write(_INDEX_RECORD.pack(code, offset, length))
+                    new_index[code] = (offset, length)
+                    offset += length
+                data_out.flush()
+                os.fsync(data_out.fileno())
+                index_out.flush()
+                os.fsync(index_out.fileno())
+
+            # Windows refuses to replace a file that is still mapped or open
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            self._reader.close()
+            self._data_file.close()
+            self._index_file.close()
+
+            os.replace(tmp_data, self.data_path)
+            os.replace(tmp_index, self.index_path)
+            self._open()
+
+        reclaimed = before - self._data_size
+        logging.info(f"[PackedCoverStore] Compacted {len(new_index)} covers, reclaimed {reclaimed} bytes.")
+        return reclaimed
+
+    def migrate_from_directory(self, directory, remove=False):
+        """
+        Import every "<code>.jpg" from the per-file layout in `directory`.
+        Codes already present in the packed store are skipped.
+        If `remove` is set, the source files are deleted after import.
+        Returns the number of covers imported.
+        """
+        source = DirectoryCoverStore(directory)
+        imported = 0
+        for code in source.codes():
+            if code not in self.index:
+                data = source.get(code)
+                if data:
+                    self.put(code, data)
+                    imported += 1
+            if remove:
+                source.remove(code)
+        logging.info(f"[PackedCoverStore] Migrated {imported} covers from {directory}.")
+        return imported
+
+
+class CoverStoreManager:
+    """
+    Front for a cover store that keeps the cache bounded:
+      - Tracks the size of every cover and evicts the least recently viewed
+        ones once the total exceeds `max_bytes` (0 disables the cap).
+      - Remembers when each cover was last viewed across runs (cover_access.json).
+      - Garbage-collects covers for codes that are no longer worth keeping,
+        compacting a packed store once most of its data file is dead.
+      - Optionally transcodes covers to WebP (`webp_quality`) as they are stored.
+    Exposes the same get / put / remove interface as the stores themselves.
+    """
+
+    def __init__(self, store, max_bytes=0, webp_quality=None):
+        self.store = store
+        self.max_bytes = max_bytes
+        self.webp_quality = webp_quality
+        self._lock = threading.Lock()
+        self._access_dirty = False
+
+        # code -> size, ordered from least to most recently viewed.
+        # Covers never viewed (no access record) are treated as the oldest.
+        last_viewed = dm.load_cover_access()
+        sizes = store.sizes()
+        self._sizes = OrderedDict(
+            (code, sizes[code])
+            for code in sorted(sizes, key=lambda c: (last_viewed.get(c, 0), c))
+        )
+        self._last_viewed = {code: ts for code, ts in last_viewed.items() if code in sizes}
+        self._total = sum(sizes.values())
+
+    def total_bytes(self):
+        return self._total
+
+    def get(self, code):
+        """Return the cover bytes for `code` (or None) and mark it as recently viewed."""
+        data = self.store.get(code)
+        if data is not None:
+            with self._lock:
+                if code in self._sizes:
+                    self._sizes.move_to_end(code)
+                self._last_viewed[code] = int(time.time())
+                self._access_dirty = True
+        return data
+
+    def put(self, code, data):
+        """Store a cover, then evict least recently viewed covers if over the cap."""
+        if not data:
+            return
+        if self.webp_quality is not None:
+            data = transcode_to_webp(data, self.webp_quality)
+        self.store.put(code, data)
+        with self._lock:
+            self._total += len(data) - self._sizes.pop(code, 0)
+            self._sizes[code] = len(data)
+            self._last_viewed[code] = int(time.time())
+            self._access_dirty = True
+        self.enforce_quota(keep=code)
+
+    def remove(self, code):
+        self.store.remove(code)
+        with self._lock:
+            self._total -= self._sizes.pop(code, 0)
+            if self._last_viewed.pop(code, None) is not None:
+                self._access_dirty = True
+
+    def __contains__(self, code):
+        return code in self._sizes
+
+    def codes(self):
+        return list(self._sizes)
+
+    def enforce_quota(self, keep=None):
+        """
+        Evict least recently viewed covers until the cache fits in `max_bytes`.
+        `keep` is never evicted (the cover that was just stored).
+        Returns the number of covers evicted.
+        """
+        if not self.max_bytes:
+            return 0
+        victims = []
+        with self._lock:
+            total = self._total
+            for code, size in self._sizes.items():
+                if total <= self.max_bytes:
+                    break
+                if code == keep:
+                    continue
+                victims.append(code)
+                total -= size
+        for code in victims:
+            self.remove(code)
+        if victims:
+            logging.info(f"[CoverStoreManager] Evicted {len(victims)} covers to stay under {self.max_bytes} bytes.")
+        return len(victims)
+
+    def collect_garbage(self, keep_codes):
+        """
+        Remove every cover whose code is not in `keep_codes`, then apply the size cap.
+        Returns the number of covers removed.
+        """
+        orphans = [code for code in self.codes() if code not in keep_codes]
+        for code in orphans:
+            self.remove(code)
+        logging.info(f"[CoverStoreManager] Garbage-collected {len(orphans)} orphaned covers.")
+        removed = len(orphans) + self.enforce_quota()
+        self.compact_if_wasteful()
+        self.save_access()
+        return removed
+
+    def compact_if_wasteful(self):
+        """
+        Compact a packed store once more than COMPACT_DEAD_FRACTION of its data
+        file is dead: removing a cover there only appends a tombstone. Run by
+        the garbage-collection pass, never from put, as it rewrites the pack.
+        Returns the number of bytes reclaimed.
+        """
+        if not isinstance(self.store, PackedCoverStore):
+            return 0
+        size = self.store.data_bytes()
+        if size - self.store.live_bytes() <= COMPACT_DEAD_FRACTION * size:
+            return 0
+        return self.store.compact()
+
+    def start_garbage_collection(self, keep_codes):
+        """Run `collect_garbage` on a daemon thread so the UI stays responsive."""
+        thread = threading.Thread(target=self.collect_garbage, args=(keep_codes,), daemon=True)
+        thread.start()
+        return thread
+
+    def save_access(self):
+        """Persist last-viewed times if anything changed since the last save."""
+        with self._lock:
+            if not self._access_dirty:
+                return
+            snapshot = dict(self._last_viewed)
+            self._access_dirty = False
+        dm.save_cover_access(snapshot)
+
+    def close(self):
+        self.save_access()
+        self.store.close()
+
+
+def open_cover_store(settings):
+    """
+    Return the cover store selected in settings:
+    the packed store if settings["covers"]["packed"] is set, else the per-file directory.
+    """
+    covers_dir = settings["paths"]["covers_directory"]
+    if settings.get("covers", {}).get("packed", False):
+        return PackedCoverStore(covers_dir)
+    return DirectoryCoverStore(covers_dir)
+
+
+def open_cover_manager(settings):
+    """
+    Return a CoverStoreManager over the configured store, capped at
+    settings["covers"]["max_size_mb"] megabytes (0 means unlimited), transcoding
+    new covers to WebP if settings["covers"]["webp"] is set.
+    """
+    covers_cfg = {**dm.DEFAULT_SETTINGS["covers"], **settings.get("covers", {})}
+    return CoverStoreManager(
+        open_cover_store(settings),
+        max_bytes=int(covers_cfg["max_size_mb"] * 1024 * 1024),
+        webp_quality=covers_cfg["webp_quality"] if covers_cfg["webp"] else None
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the packed cover store.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    migrate = sub.add_parser("migrate", help="Import per-file covers into the packed store.")
+    migrate.add_argument("--remove", action="store_true", help="Delete the per-file covers after import.")
+    sub.add_parser("compact", help="Drop superseded and removed covers from the packed store.")
+    webp = sub.add_parser("webp", help="Transcode every cached cover in the configured store to WebP.")
+    webp.add_argument("--quality", type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    settings = dm.load_settings()
+    covers_dir = settings["paths"]["covers_directory"]
+
+    if args.command == "webp":
+        quality = args.quality
+        if quality is None:
+            quality = settings.get("covers", {}).get("webp_quality", dm.DEFAULT_SETTINGS["covers"]["webp_quality"])
+        store = open_cover_store(settings)
+        try:
+            converted, before, after = convert_store_to_webp(store, quality)
+            if isinstance(store, PackedCoverStore):
+                store.compact()
+        finally:
+            store.close()
+        print(f"Converted {converted} covers: {before} -> {after} bytes.")
+        return
+
+    store = PackedCoverStore(covers_dir)
+    try:
+        if args.command == "migrate":
+            count = store.migrate_from_directory(covers_dir, remove=args.remove)
+            print(f"Migrated {count} covers.")
+        elif args.command == "compact":
+            reclaimed = store.compact()
+            print(f"Reclaimed {reclaimed} bytes.")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Bulk cover warm-up.
+
+Resolves and downloads covers for every visible code (optionally only codes
+carrying one of a set of tags) into the local cover store, so they don't have
+to be fetched interactively later. Codes whose cover is already cached are
+skipped, which makes the job resumable: stop it at any point and the next run
+picks up where it left off.
+
+Used from PageThree ("Warm covers") and headless:
+
+    python cover_warmup.py [--tags name1,name2] [--concurrency N]
+"""
+
+import time
+import asyncio
+import logging
+import argparse
+
+import data_manager_json as dm
+from tag_search import TagNameIndex
+from cover_priority import PRIORITY_BULK
+
+DEFAULT_CONCURRENCY = 4
+
+
+def select_codes(code_store, cover_store, tag_ids=None):
+    """
+    Return the visible codes (carrying any of `tag_ids`, if given) that have no cached cover yet.
+    An empty `tag_ids` matches nothing; pass None for every visible code.
+    """
+    if tag_ids is None:
+        codes = code_store.visible_codes()
+    elif not tag_ids:
+        return []
+    else:
+        codes = code_store.codes_with_any_tag(tag_ids)
+    return [code for code in codes.tolist() if code not in cover_store]
+
+
+class CoverWarmupJob:
+    """
+    Downloads covers for `codes` with at most `concurrency` in flight.
+
+    Runs as a coroutine on an asyncio loop; `pause()`, `resume()` and `stop()`
+    may be called from any thread. Progress is exposed through `done`, `failed`,
+    `total` and `rate()` for polling from the UI.
+    """
+
+    def __init__(self, cover_loader, cover_store, code_store, codes, concurrency=DEFAULT_CONCURRENCY):
+        self.cover_loader = cover_loader
+        self.cover_store = cover_store
+        self.code_store = code_store
+        self.codes = list(codes)
+        self.concurrency = concurrency
+
+        self.total = len(self.codes)
+        self.done = 0
+        self.failed = 0
+        self.finished = False
+        self.resolved_covers = {}        # code -> cover URL newly written into code_store, for the caller to persist
+
+        self.loop = None
+        self._running = None             # asyncio.Event, set while not paused
+        self._stopped = False
+        self._started_at = None
+        self._paused_at = None
+        self._paused_total = 0.0
+
+    # ---- control (thread-safe) ----
+
+    def pause(self):
+        if self.loop and not self.is_paused():
+            self._paused_at = time.monotonic()
+            self.loop.call_soon_threadsafe(self._running.clear)
+
+    def resume(self):
+        if self.loop and self.is_paused():
+            self._paused_total += time.monotonic() - self._paused_at
+            self._paused_at = None
+            self.loop.call_soon_threadsafe(self._running.set)
+
+    def stop(self):
+        self._stopped = True
+        if self.loop:
+            self.loop.call_soon_threadsafe(self._running.set)
+
+    def is_paused(self):
+        return self._paused_at is not None
+
+    # ---- progress ----
+
+    def elapsed(self):
+        """Seconds spent working, not counting time spent paused."""
+        if self._started_at is None:
+            return 0.0
+        paused = self._paused_total
+        if self._paused_at is not None:
+            paused += time.monotonic() - self._paused_at
+        return time.monotonic() - self._started_at - paused
+
+    def rate(self):
+        """Covers processed per second."""
+        elapsed = self.elapsed()
+        return (self.done + self.failed) / elapsed if elapsed > 0 else 0.0
+
+    def progress_text(self):
+        return f"{self.done + self.failed}/{self.total} covers ({self.failed} failed), {self.rate():.1f}/s"
+
+    # ---- work ----
+
+    async def run(self):
+        """Process every code, then return. Safe to await only once."""
+        self.loop = asyncio.get_running_loop()
+        self._running = asyncio.Event()
+        self._running.set()
+        self._started_at = time.monotonic()
+
+        queue = asyncio.Queue()
+        for code in self.codes:
+            queue.put_nowait(code)
+
+        await self.cover_loader.open_session()
+        workers = [asyncio.create_task(self._worker(queue)) for _ in range(self.concurrency)]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            self.finished = True
+            logging.info(f"[CoverWarmupJob] Finished: {self.progress_text()}")
+
+    async def _worker(self, queue):
+        while not self._stopped:
+            await self._running.wait()
+            if self._stopped:
+                return
+            try:
+                code = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                ok = await self._warm_one(code)
+            except Exception as e:
+                logging.error(f"[CoverWarmupJob] Error warming cover for code {code}: {e}")
+                ok = False
+            if ok:
+                self.done += 1
+            else:
+                self.failed += 1
+
+    async def _warm_one(self, code):
+        cover_url = self.code_store.cover(code)
+        if not cover_url:
+            cover_url = await self.cover_loader.load_cover_image_if_needed(code, PRIORITY_BULK)
+            if not cover_url:
+                return False
+            if code in self.code_store:
+                self.code_store.set_cover(code, cover_url)
+                self.resolved_covers[code] = cover_url
+
+        data = await self.cover_loader.download_cover(cover_url, PRIORITY_BULK)
+        if not data:
+            return False
+        await asyncio.to_thread(self.cover_store.put, code, data)
+        return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Download covers for all visible codes into the cover store.")
+    parser.add_argument("--tags", default="", help="Comma-separated tag names or ids; only warm codes carrying one of them.")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    args = parser.parse_args()
+
+    # Imported here so the UI module can import this one without a cycle
+    from Applic import CoverLoader
+    from cover_store import open_cover_manager
+
+    # Importing Applic already pointed logging at the GUI's log file; log to the console instead
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s", force=True)
+    settings = dm.load_settings()
+    code_store = dm.load_code_store()
+    code_store.set_banned_tags(settings["banned"]["tags"])
+    cover_store = open_cover_manager(settings)
+
+    tag_ids = None
+    if args.tags:
+        tag_ids = []
+        tag_index = TagNameIndex(dm.read_tags() or {})
+        for part in args.tags.split(","):
+            part = part.strip()
+            if part.isdigit():
+                tag_ids.append(int(part))
+            elif part:
+                tag_ids.extend(tag_index.search(part))
+        if not tag_ids:
+            cover_store.close()
+            raise SystemExit(f"No tag matches {args.tags!r}.")
+
+    codes = select_codes(code_store, cover_store, tag_ids)
+    job = CoverWarmupJob(CoverLoader(), cover_store, code_store, codes, concurrency=args.concurrency)
+    print(f"Warming {job.total} covers...")
+
+    async def run_with_progress():
+        task = asyncio.create_task(job.run())
+        while not task.done():
+            await asyncio.sleep(5)
+            print(job.progress_text())
+        await task
+        await job.cover_loader.close_session()
+
+    try:
+        asyncio.run(run_with_progress())
+    except KeyboardInterrupt:
+        print("Interrupted; cached covers are kept and will be skipped next run.")
+    finally:
+        if job.resolved_covers:
+            dm.set_code_covers(code_store, job.resolved_covers)
+            dm.save_codes_json(code_store, changed=())
+        cover_store.close()
+    print(job.progress_text())
+
+
+if __name__ == "__main__":
+    main()
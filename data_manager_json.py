@@ -1,5 +1,12 @@
 import os
-import json
+import glob
+import atexit
+import hashlib
+import threading
+
+import serializer
+import data_manager_sqlite as dbm
+from code_store import CodeStore
 
 INFO_DIR = "Info"  # Will be overridden by settings, if present
 COVERS_DIR = "Covers"
@@ -23,7 +30,9 @@ DEFAULT_SETTINGS = {
         "language": "en-US",
         "auto_update": True,
         "enable_notifications": True,
-        "window_size": "400x510"
+        "window_size": "400x510",
+        "no_repeat": False,
+        "recommend": False
     },
     "paths": {
         "info_directory": "Info/",
@@ -36,6 +45,15 @@ DEFAULT_SETTINGS = {
             32341
         ]
     },
+    "storage": {
+        "backend": "json"
+    },
+    "covers": {
+        "packed": False,
+        "max_size_mb": 2048,
+        "webp": False,
+        "webp_quality": 80
+    },
     "in_progress":{
         },
     "images": False
@@ -46,10 +64,359 @@ def _ensure_settings_file():
     If the settings file doesn't exist, create one with DEFAULT_SETTINGS.
     """
     if not os.path.exists(SETTINGS_JSON):
-        os.makedirs(os.path.dirname(SETTINGS_JSON), exist_ok=True)
-        write_settings(DEFAULT_SETTINGS)
+        _atomic_write(SETTINGS_JSON, _encode_settings(DEFAULT_SETTINGS))
+
+def _use_sqlite(settings):
+    """True if settings select the SQLite storage backend instead of the JSON files."""
+    return settings.get("storage", {}).get("backend", "json") == "sqlite"
+
+def _db(settings):
+    """
+    Return the SQLite database in the info directory. The first time it is
+    opened, the existing JSON data is migrated into it.
+    """
+    info_dir = settings["paths"]["info_directory"]
+    db = dbm.connect(os.path.join(info_dir, dbm.DB_FILE))
+    if not db.is_migrated():
+        db.migrate_from_json(
+            _load_codes_file(_codes_path(settings)),
+            _load_favorites_file(_favorites_path(settings)),
+            settings.get("in_progress", {})
+        )
+    return db
+
+def migrate_json_to_sqlite(force=False):
+    """
+    Import the JSON files into the SQLite database, unless that already happened
+    (or `force` is set). Returns the number of codes imported.
+    """
+    settings = _read_settings_file()
+    info_dir = settings["paths"]["info_directory"]
+    db = dbm.connect(os.path.join(info_dir, dbm.DB_FILE))
+    if db.is_migrated() and not force:
+        return 0
+    codes_dict = _load_codes_file(_codes_path(settings))
+    db.migrate_from_json(codes_dict, _load_favorites_file(_favorites_path(settings)), settings.get("in_progress", {}))
+    return len(codes_dict)
+
+def _codes_path(settings):
+    return os.path.join(settings["paths"]["info_directory"], "usable_codes.json")
+
+def _favorites_path(settings):
+    return os.path.join(settings["paths"]["info_directory"], "favorite_codes.json")
+
+# --------------------
+# Background writer
+#
+# Snapshot files (codes, favorites, settings, tags, cover access times) are
+# written by one background thread instead of the caller. Saving a file again
+# while its previous save is still queued replaces that save, so a burst of
+# saves becomes one write of the latest contents. Every write goes to a temp
+# file that is fsynced and then os.replace()d over the target, so an
+# interrupted write leaves the previous file intact.
+# --------------------
+
+def _atomic_write(path, data):
+    """Replace `path` with the bytes `data` via a fsynced temp file."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+class BackgroundWriter:
+    """
+    Runs queued write jobs, oldest first, on one daemon thread.
+    Jobs are keyed (usually by the file they write): submitting a key that is
+    still queued replaces that job in place.
+    """
+
+    def __init__(self):
+        self._jobs = {}          # key -> callable, in submission order
+        self._running = False
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def submit(self, key, job, supersedes=(), unless_queued=()):
+        """
+        Queue `job()` under `key`. Queued jobs under any of `supersedes` are
+        dropped; if a job under any of `unless_queued` is queued, nothing is
+        submitted. Returns True if the job was queued.
+        """
+        with self._cond:
+            if any(k in self._jobs for k in unless_queued):
+                return False
+            for k in supersedes:
+                self._jobs.pop(k, None)
+            self._jobs[key] = job
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="dm-writer", daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+            return True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._jobs:
+                    self._cond.wait()
+                key = next(iter(self._jobs))
+                job = self._jobs.pop(key)
+                self._running = True
+            try:
+                job()
+            except Exception as e:
+                print(f"Error: Could not write {key}. {e}")
+            finally:
+                with self._cond:
+                    self._running = False
+                    self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """Block until every queued write has finished. Returns False on timeout."""
+        if threading.current_thread() is self._thread:
+            return True
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._jobs and not self._running, timeout)
+
+_writer = BackgroundWriter()
+
+def flush():
+    """Write pending settings and wait for every queued write to reach disk. Call on exit."""
+    _settings_manager.flush()
+    _writer.flush()
+
+atexit.register(flush)
+
+# --------------------
+# Change logs (JSON backend)
+#
+# Single-code changes are appended as one JSON line to "<snapshot>.changes.jsonl"
+# next to the snapshot file instead of rewriting it. Loading replays the log
+# over the snapshot; a full save or a background compaction folds it back in.
+# Every entry carries an increasing "seq", so once a snapshot is on disk the
+# entries it covers (seq <= the last one logged when it was taken) can be
+# dropped, whatever was appended or compacted meanwhile.
+# --------------------
+
+CHANGE_LOG_COMPACT_BYTES = 256 * 1024   # Compact once a log grows past this
+
+_changes_lock = threading.Lock()      # Guards appends, log rewrites, _log_seq and _save_gen
+_log_seq = {}                         # Snapshot path -> seq of its last logged entry
+_save_gen = {}                        # Snapshot path -> number of full saves submitted
+
+def _changes_path(json_path):
+    return os.path.splitext(json_path)[0] + ".changes.jsonl"
+
+def _read_change_lines(json_path):
+    """Return [(entry, raw line)] from the log, oldest first. A torn trailing line is skipped."""
+    try:
+        with open(_changes_path(json_path), "rb") as f:
+            raw = f.read()
+    except FileNotFoundError:
+        return []
+    entries = []
+    for line in raw.splitlines():
+        try:
+            entries.append((serializer.loads(line), line))
+        except ValueError:
+            continue
+    return entries
+
+def _read_changes(json_path, upto=None):
+    """
+    Return the logged change entries for `json_path`, oldest first,
+    only those with seq <= `upto` if given.
+    """
+    return [
+        entry for entry, _ in _read_change_lines(json_path)
+        if upto is None or entry.get("seq", 0) <= upto
+    ]
+
+def _last_seq(json_path):
+    """Seq of the last entry logged for `json_path` (0 if none). Call with _changes_lock held."""
+    if json_path not in _log_seq:
+        _log_seq[json_path] = max((entry.get("seq", 0) for entry, _ in _read_change_lines(json_path)), default=0)
+    return _log_seq[json_path]
+
+def _drop_changes(json_path, upto, save_gen=None):
+    """
+    Remove the entries with seq <= `upto`, now that the snapshot covers them.
+    Entries appended after that point are kept. If `save_gen` is given and a
+    full save was submitted since, nothing is dropped: that save will replace
+    the snapshot with one that may not include these entries yet.
+    """
+    log_path = _changes_path(json_path)
+    with _changes_lock:
+        if save_gen is not None and _save_gen.get(json_path, 0) != save_gen:
+            return
+        kept = [line for entry, line in _read_change_lines(json_path) if entry.get("seq", 0) > upto]
+        if not kept:
+            if os.path.exists(log_path):
+                os.remove(log_path)
+            return
+        tmp_path = log_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(b"\n".join(kept) + b"\n")
+        os.replace(tmp_path, log_path)
+
+def _save_snapshot(json_path, capture, encode, after=None):
+    """
+    Queue a rewrite of the snapshot `json_path`. `capture()` runs here and takes
+    what to write; on the writer thread, `encode(captured)` turns it into the
+    file's bytes, then `after(captured)` runs, if given.
+    Log entries appended before the capture are covered by the snapshot (their
+    changes were applied to memory before being logged) and are dropped once it
+    is written, so the capture must come after noting the last one.
+    """
+    with _changes_lock:
+        upto = _last_seq(json_path)
+        _save_gen[json_path] = _save_gen.get(json_path, 0) + 1
+    captured = capture()
+
+    def job():
+        _atomic_write(json_path, encode(captured))
+        _drop_changes(json_path, upto)
+        if after is not None:
+            after(captured)
+
+    _writer.submit(json_path, job, supersedes=[("compact", json_path)])
+
+def _append_change(json_path, entry, compact):
+    """
+    Append one change entry to the log of `json_path`. When the log passes
+    CHANGE_LOG_COMPACT_BYTES, `compact(json_path)` is queued on the writer,
+    unless a full save of that snapshot is already queued.
+    """
+    os.makedirs(os.path.dirname(json_path), exist_ok=True)
+    with _changes_lock:
+        seq = _last_seq(json_path) + 1
+        with open(_changes_path(json_path), "ab") as f:
+            f.write(serializer.dumps({**entry, "seq": seq}) + b"\n")
+            size = f.tell()
+        _log_seq[json_path] = seq
+    if size >= CHANGE_LOG_COMPACT_BYTES:
+        _writer.submit(("compact", json_path), lambda: compact(json_path), unless_queued=[json_path])
+
+def _compact(json_path, load, render, after=None):
+    """
+    Fold the change log of `json_path` into its snapshot, then call
+    `after(data)` with the data written, if given. Runs on the writer
+    thread, so it never interleaves with a snapshot save.
+    """
+    try:
+        if os.path.getsize(_changes_path(json_path)) < CHANGE_LOG_COMPACT_BYTES:
+            return
+    except FileNotFoundError:
+        return
+    with _changes_lock:
+        upto = _last_seq(json_path)
+        save_gen = _save_gen.get(json_path, 0)
+    data = load(json_path, upto)
+    _atomic_write(json_path, render(data))
+    _drop_changes(json_path, upto, save_gen)
+    if after is not None:
+        after(data)
+
+# --------------------
+# Codes
+# --------------------
 
 def load_codes_json():
+    """
+    Load all codes as {code: {"tags": set, "cover": str, "visible": int}}
+    from the configured storage backend.
+    """
+    settings = load_settings()
+    if _use_sqlite(settings):
+        return _db(settings).load_codes()
+    _writer.flush()  # Read our own queued saves
+    return _load_codes_file(_codes_path(settings))
+
+def _code_snapshot_path(usable_codes_path, signature):
+    """
+    The binary CodeStore snapshot made for `signature`, next to usable_codes.json
+    (see code_store.py). Every version gets a file of its own: the app keeps the
+    one it started from mapped, and Windows can't replace a mapped file.
+    """
+    digest = hashlib.sha1(signature.encode("utf-8")).hexdigest()[:16]
+    return f"{os.path.splitext(usable_codes_path)[0]}.{digest}.bin"
+
+def _remove_stale_code_snapshots(usable_codes_path, keep):
+    """Delete the binary snapshots other than `keep`, skipping any still mapped (Windows)."""
+    base = os.path.splitext(usable_codes_path)[0]
+    for path in glob.glob(glob.escape(base) + ".*.bin") + [base + ".bin"]:
+        if path != keep and os.path.exists(path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass  # Removed by a later save or start instead
+
+def _json_signature(json_path):
+    """Identifies one version of a JSON snapshot file; None if it doesn't exist."""
+    try:
+        stat = os.stat(json_path)
+    except FileNotFoundError:
+        return None
+    return f"json:{stat.st_mtime_ns}:{stat.st_size}"
+
+def _write_code_snapshot(store, usable_codes_path, signature):
+    """
+    Write `store` (a freeze() copy or a store nobody else holds) as the binary
+    snapshot for `signature`, then drop the older ones.
+    """
+    if signature is not None:
+        path = _code_snapshot_path(usable_codes_path, signature)
+        store.write_snapshot(path, signature)
+        if os.path.exists(path):
+            _remove_stale_code_snapshots(usable_codes_path, path)
+
+def load_code_store():
+    """
+    Load all codes into a columnar CodeStore (a read-only mapping with the
+    same records as load_codes_json(), see code_store.py).
+
+    The store is opened from the memory-mapped binary snapshot when that was
+    made from the current JSON file (or database generation), which takes the
+    same time however many codes there are; visibility changes made since are
+    replayed on top. Otherwise the JSON records are decoded straight into the
+    store, its tag index is built, and the snapshot is regenerated in the
+    background.
+    """
+    settings = load_settings()
+    usable_codes_path = _codes_path(settings)
+    if _use_sqlite(settings):
+        db = _db(settings)
+        signature = f"sqlite:{db.codes_generation()}"
+        store = CodeStore.open_snapshot(_code_snapshot_path(usable_codes_path, signature), signature)
+        if store is not None:
+            _remove_stale_code_snapshots(usable_codes_path, _code_snapshot_path(usable_codes_path, signature))
+            store.set_hidden(db.hidden_codes())
+            return store
+        store = CodeStore.from_dict(db.load_codes())
+    else:
+        _writer.flush()  # Read our own queued saves
+        signature = _json_signature(usable_codes_path)
+        store = CodeStore.open_snapshot(_code_snapshot_path(usable_codes_path, signature), signature) if signature else None
+        if store is not None:
+            _remove_stale_code_snapshots(usable_codes_path, _code_snapshot_path(usable_codes_path, signature))
+            for entry in _read_changes(usable_codes_path):
+                if entry["code"] in store:
+                    store.set_visible(entry["code"], entry["visible"])
+            return store
+        store = CodeStore.from_records(_load_codes_records(usable_codes_path))
+
+    store.tag_postings()  # Build the tag index here, off the UI thread; the snapshot keeps it
+    frozen = store.freeze()
+    _writer.submit(
+        ("code snapshot", usable_codes_path),
+        lambda: _write_code_snapshot(frozen, usable_codes_path, signature)
+    )
+    return store
+
+def _load_codes_records(usable_codes_path, upto=None):
     """
     Load the JSON file which contains a dict of the form:
       {
@@ -57,14 +424,25 @@ def load_codes_json():
         "63": {"tags": [24832, ...], "visible": 1},
         ...
       }
+    as decoded, then replay the visibility changes logged since it was written
+    (those with seq <= `upto`, if given).
     """
-    if not os.path.exists(USABLE_CODES_JSON):
-        return {}
-    with open(USABLE_CODES_JSON, "r", encoding="utf-8") as f:
-        raw_dict = json.load(f)
+    raw_dict = {}
+    if os.path.exists(usable_codes_path):
+        raw_dict = serializer.load_file(usable_codes_path)
 
+    for entry in _read_changes(usable_codes_path, upto):
+        code_obj = raw_dict.get(str(entry["code"]))
+        if code_obj is not None:
+            code_obj["visible"] = entry["visible"]
+    return raw_dict
+
+def _load_codes_file(usable_codes_path, upto=None):
+    """
+    Like _load_codes_records, converting keys to int and tags to sets.
+    """
     final_dict = {}
-    for code_str, obj in raw_dict.items():
+    for code_str, obj in _load_codes_records(usable_codes_path, upto).items():
         code_int = int(code_str)
         tags_list = obj.get("tags", [])
         cover = obj.get("cover", "")
@@ -76,17 +454,8 @@ def load_codes_json():
         }
     return final_dict
 
-def save_codes_json(codes_dict):
-    """
-    Save the dict of codes into JSON, converting sets to lists.
-    """
-    # Use the settings for info_directory (if you'd like to store in a custom folder)
-    settings = load_settings()
-    info_dir = settings["paths"]["info_directory"]
-    # Adjust your path usage if you decide to place your JSON files in info_dir
-    usable_codes_path = os.path.join(info_dir, "usable_codes.json")
-    os.makedirs(os.path.dirname(usable_codes_path), exist_ok=True)
-
+def _codes_out_dict(codes_dict):
+    """The JSON shape of `codes_dict`: string keys, tag lists."""
     out_dict = {}
     for code_int, data_obj in codes_dict.items():
         tags_set = data_obj.get("tags", set())
@@ -97,66 +466,160 @@ def save_codes_json(codes_dict):
             "cover": cover_url,
             "visible": visible_val
         }
+    return out_dict
 
-    with open(usable_codes_path, "w", encoding="utf-8") as f:
-        json.dump(out_dict, f, indent=2)
+def save_codes_json(codes_dict, changed=None):
+    """
+    Save the dict of codes (or a CodeStore) as compact JSON, converting sets to lists.
+    A dict is converted here, a CodeStore is only frozen here; encoding and writing
+    happen on the background writer. For a CodeStore the binary snapshot is
+    rewritten too. The snapshot then covers every logged change, so the change
+    log is emptied.
 
-def load_favorite_json():
+    With SQLite only the codes in `changed` (added or retagged since the last
+    save; every code if None) are written, as upserts of their rows; covers and
+    visibility are persisted as they change (set_code_covers, set_code_visible).
     """
-    Load the JSON file containing favorites. Convert keys to int, tags to sets.
+    # Use the settings for info_directory (if you'd like to store in a custom folder)
+    settings = load_settings()
+    usable_codes_path = _codes_path(settings)
+    if _use_sqlite(settings):
+        db = _db(settings)
+        codes = codes_dict.keys() if changed is None else [code for code in changed if code in codes_dict]
+        db.upsert_codes(
+            (code, codes_dict[code]["tags"], codes_dict[code].get("cover", ""), codes_dict[code].get("visible", 1))
+            for code in codes
+        )
+        if isinstance(codes_dict, CodeStore):
+            frozen = codes_dict.freeze()
+            signature = f"sqlite:{db.codes_generation()}"
+            _writer.submit(
+                ("code snapshot", usable_codes_path),
+                lambda: _write_code_snapshot(frozen, usable_codes_path, signature)
+            )
+        return
+
+    if isinstance(codes_dict, CodeStore):
+        # Keep the binary snapshot in step with the JSON it is stamped with;
+        # the caller only pays for the freeze, the writer does the rest
+        _save_snapshot(
+            usable_codes_path,
+            codes_dict.freeze,
+            lambda frozen: serializer.dumps(frozen.to_records()),
+            lambda frozen: _write_code_snapshot(frozen, usable_codes_path, _json_signature(usable_codes_path))
+        )
+        return
+    _save_snapshot(usable_codes_path, lambda: _codes_out_dict(codes_dict), serializer.dumps)
+
+def _compact_codes(usable_codes_path):
+    """Fold the codes change log into the snapshot, and regenerate the binary snapshot to match."""
+    _compact(
+        usable_codes_path, _load_codes_records, serializer.dumps,
+        lambda records: _write_code_snapshot(
+            CodeStore.from_records(records), usable_codes_path, _json_signature(usable_codes_path)
+        )
+    )
+
+def set_code_visible(codes_dict, code, visible):
+    """
+    Set one code's visible flag in `codes_dict` (a dict or a CodeStore) and
+    persist just that change: one row in SQLite, one appended log line with JSON files.
     """
+    if isinstance(codes_dict, CodeStore):
+        codes_dict.set_visible(code, visible)
+    else:
+        codes_dict[code]["visible"] = visible
     settings = load_settings()
-    info_dir = settings["paths"]["info_directory"]
-    favorites_path = os.path.join(info_dir, "favorite_codes.json")
-    if not os.path.exists(favorites_path):
-        return {}
-    try:
-        with open(favorites_path, "r", encoding="utf-8") as f:
-            raw_dict = json.load(f)
-        final_dict = {}
-        for code_str, obj in raw_dict.items():
-            code_int = int(code_str)
-            tags_list = obj.get("tags", [])
-            name = obj.get("name", "")
-            folder = obj.get("folder", None)
-            final_dict[code_int] = {
-                "tags": set(tags_list),
-                "name": name,
-                "folder":folder
-            }
-        return final_dict   
-    except:
-        return {}
-     
-def add_favorites_json(code_dict):
+    if _use_sqlite(settings):
+        _db(settings).set_code_visible(code, visible)
+    else:
+        _append_change(_codes_path(settings), {"code": code, "visible": visible}, _compact_codes)
+
+def set_all_codes_visible(codes_dict):
     """
-    Merge in a new favorite code. Convert sets to lists before saving.
+    Mark every code in `codes_dict` (a dict or a CodeStore) visible and persist
+    it: one UPDATE in SQLite, a full save with JSON files.
     """
-    out_dict = load_favorite_json()
-    out_dict.update(code_dict)
+    if isinstance(codes_dict, CodeStore):
+        codes_dict.set_all_visible()
+    else:
+        for data_obj in codes_dict.values():
+            data_obj["visible"] = 1
+    settings = load_settings()
+    if _use_sqlite(settings):
+        _db(settings).set_all_codes_visible()
+    else:
+        save_codes_json(codes_dict)
 
-    updated_dict = {}
-    for code_int, data_obj in out_dict.items():
-        tags_set = data_obj.get("tags", set())
-        name_val = data_obj.get("name", "")
-        folder = data_obj.get("folder", None)
-        updated_dict[str(code_int)] = {
-            "tags": list(tags_set),
-            "name": name_val,
-            "folder": folder
-        }
+def set_code_covers(codes_dict, covers):
+    """
+    Set the covers in `covers` ({code: url}) in `codes_dict` (a dict or a
+    CodeStore). With SQLite only those rows are written, in one transaction;
+    JSON files get them with the next save_codes_json.
+    """
+    for code, cover in covers.items():
+        if isinstance(codes_dict, CodeStore):
+            codes_dict.set_cover(code, cover)
+        else:
+            codes_dict[code]["cover"] = cover
     settings = load_settings()
-    info_dir = settings["paths"]["info_directory"]
-    favorites_path = os.path.join(info_dir, "favorite_codes.json")
-    os.makedirs(os.path.dirname(favorites_path), exist_ok=True)
+    if _use_sqlite(settings):
+        _db(settings).set_code_covers(covers.items())
 
-    with open(favorites_path, "w", encoding="utf-8") as f:
-        json.dump(updated_dict, f, indent=2)
-        
-def save_favorites_json(codes_dict):
+# --------------------
+# Favorites
+# --------------------
+
+def load_favorite_json():
+    """
+    Load favorites as {code: {"tags": set, "name": str, "folder": str or None}}
+    from the configured storage backend.
     """
-    Fully overwrite the favorites file.
+    settings = load_settings()
+    if _use_sqlite(settings):
+        return _db(settings).load_favorites()
+    _writer.flush()  # Read our own queued saves
+    return _load_favorites_file(_favorites_path(settings))
+
+def _load_favorites_file(favorites_path, upto=None):
+    """
+    Load the JSON file containing favorites. Convert keys to int, tags to sets.
+    Then replay the favorite changes logged since it was written.
     """
+    final_dict = {}
+    if os.path.exists(favorites_path):
+        try:
+            raw_dict = serializer.load_file(favorites_path)
+            for code_str, obj in raw_dict.items():
+                code_int = int(code_str)
+                tags_list = obj.get("tags", [])
+                name = obj.get("name", "")
+                folder = obj.get("folder", None)
+                final_dict[code_int] = {
+                    "tags": set(tags_list),
+                    "name": name,
+                    "folder":folder
+                }
+        except (ValueError, AttributeError) as e:
+            print(f"Error: Could not read {favorites_path}. {e}")
+            return {}
+
+    for entry in _read_changes(favorites_path, upto):
+        code_int = entry["code"]
+        if entry["op"] == "add":
+            final_dict[code_int] = {
+                "tags": set(entry.get("tags", [])),
+                "name": entry.get("name", ""),
+                "folder": entry.get("folder", None)
+            }
+        elif entry["op"] == "remove":
+            final_dict.pop(code_int, None)
+        elif entry["op"] == "folder" and code_int in final_dict:
+            final_dict[code_int]["folder"] = entry["folder"]
+    return final_dict
+
+def _favorites_out_dict(codes_dict):
+    """The JSON shape of the favorites in `codes_dict`: string keys, tag lists."""
     updated_dict = {}
     for code_int, data_obj in codes_dict.items():
         tags_set = data_obj.get("tags", set())
@@ -167,56 +630,252 @@ def save_favorites_json(codes_dict):
             "name": name_val,
             "folder":folder
         }
-    settings = load_settings()
-    info_dir = settings["paths"]["info_directory"]
-    favorites_path = os.path.join(info_dir, "favorite_codes.json")
-    os.makedirs(os.path.dirname(favorites_path), exist_ok=True)
+    return updated_dict
 
-    with open(favorites_path, "w", encoding="utf-8") as f:
-        json.dump(updated_dict, f, indent=2)
+def _compact_favorites(favorites_path):
+    """Fold the favorites change log into the snapshot."""
+    _compact(favorites_path, _load_favorites_file, lambda codes_dict: serializer.dumps(_favorites_out_dict(codes_dict)))
+
+def add_favorites_json(code_dict):
+    """
+    Merge in new favorite codes. Convert sets to lists before saving.
+    """
+    settings = load_settings()
+    if _use_sqlite(settings):
+        _db(settings).add_favorites(code_dict)
+        return
+    for code_int, data_obj in code_dict.items():
+        _append_change(_favorites_path(settings), {
+            "op": "add",
+            "code": code_int,
+            "tags": list(data_obj.get("tags", set())),
+            "name": data_obj.get("name", ""),
+            "folder": data_obj.get("folder", None)
+        }, _compact_favorites)
         
-def load_settings():
+def save_favorites_json(codes_dict):
     """
-    1) Ensure a settings file exists (create if missing).
-    2) Load it. Convert banned tags back into tuple form.
+    Fully overwrite the favorites file (which also empties its change log).
+    """
+    settings = load_settings()
+    if _use_sqlite(settings):
+        _db(settings).save_favorites(codes_dict)
+        return
+    _save_snapshot(_favorites_path(settings), lambda: _favorites_out_dict(codes_dict), serializer.dumps)
+        
+def add_favorite(code, entry):
+    """
+    Add (or replace) a single favorite: entry = {"tags": ..., "name": ..., "folder": ...}.
+    """
+    add_favorites_json({code: entry})
+
+def remove_favorite(code):
+    """
+    Remove a single favorite, if present.
+    """
+    settings = load_settings()
+    if _use_sqlite(settings):
+        _db(settings).remove_favorite(code)
+        return
+    _append_change(_favorites_path(settings), {"op": "remove", "code": code}, _compact_favorites)
+
+def set_favorite_folder(code, folder):
     """
+    Move a single favorite into `folder` ("" or None takes it out of any folder).
+    """
+    settings = load_settings()
+    if _use_sqlite(settings):
+        _db(settings).set_favorite_folder(code, folder)
+        return
+    _append_change(_favorites_path(settings), {"op": "folder", "code": code, "folder": folder}, _compact_favorites)
+
+# --------------------
+# Settings
+# --------------------
+
+def set_in_progress(settings, code, page):
+    """
+    Record `code` as in progress at `page`, both in `settings` and on disk.
+    """
+    settings["in_progress"][str(code)] = page
+    if _use_sqlite(settings):
+        _db(settings).set_in_progress(code, page)
+    else:
+        write_settings(settings)
+
+def clear_in_progress(settings, code):
+    """
+    Drop `code` from the in-progress entries, both in `settings` and on disk.
+    """
+    if settings["in_progress"].pop(str(code), None) is None:
+        return
+    if _use_sqlite(settings):
+        _db(settings).clear_in_progress(code)
+    else:
+        write_settings(settings)
+
+SETTINGS_WRITE_DELAY = 0.5   # Seconds to wait for more changes before writing settings
+
+def _read_settings_file():
     _ensure_settings_file()
-    with open(SETTINGS_JSON, "r", encoding="utf-8") as file:
-        settings = json.load(file)
+    return serializer.load_file(SETTINGS_JSON)
 
-    # Convert banned tags from lists back to tuples
-    # if "banned" in settings and "tags" in settings["banned"]:
-    #     settings["banned"]["tags"] = [tuple(tag) for tag in settings["banned"]["tags"]]
-    return settings
+def _encode_settings(settings):
+    """
+    The settings.json contents for `settings`, pretty-printed since it is edited by hand.
+    With the SQLite backend, in-progress entries live in the database instead.
+    """
+    if _use_sqlite(settings):
+        _db(settings)  # Make sure in-progress entries were migrated before dropping them here
+        settings = {key: value for key, value in settings.items() if key != "in_progress"}
+    return serializer.dumps(settings, pretty=True)
 
-def write_settings(settings):
+class SettingsManager:
     """
-    Write settings dict back to file, making sure banned tags are lists of lists.
+    Keeps the settings dict in memory:
+      - `get()` re-parses settings.json only when its mtime changed (someone
+        edited it by hand); otherwise it returns the cached dict.
+      - `set()` replaces the cached dict and hands it to the background writer
+        after SETTINGS_WRITE_DELAY seconds of quiet, so a burst of changes
+        becomes one write.
+      - `flush()` hands any pending change to the writer right away.
+    The dict counts as pending until the writer has written its latest version.
     """
 
-    # Ensure the directory exists
-    os.makedirs(os.path.dirname(SETTINGS_JSON), exist_ok=True)
+    def __init__(self, delay=SETTINGS_WRITE_DELAY):
+        self.delay = delay
+        self._settings = None
+        self._mtime = None
+        self._pending = False
+        self._version = 0        # Bumped by every set()
+        self._submitted = 0      # Last version handed to the writer
+        self._timer = None
+        self._lock = threading.RLock()
+
+    def _file_mtime(self):
+        try:
+            return os.stat(SETTINGS_JSON).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def get(self):
+        with self._lock:
+            # Our own unwritten change is newer than anything on disk
+            if self._pending:
+                return self._settings
+            mtime = self._file_mtime()
+            if self._settings is None or mtime is None or mtime != self._mtime:
+                settings = _read_settings_file()
+                # Convert banned tags from lists back to tuples
+                # if "banned" in settings and "tags" in settings["banned"]:
+                #     settings["banned"]["tags"] = [tuple(tag) for tag in settings["banned"]["tags"]]
+                if _use_sqlite(settings):
+                    settings["in_progress"] = _db(settings).load_in_progress()
+                self._settings = settings
+                self._mtime = self._file_mtime()
+            return self._settings
+
+    def set(self, settings):
+        with self._lock:
+            self._settings = settings
+            self._pending = True
+            self._version += 1
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.delay, self._write_pending)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _write_pending(self, retry=True):
+        with self._lock:
+            if not self._pending or self._submitted == self._version:
+                return
+            try:
+                data = _encode_settings(self._settings)
+            except RuntimeError:
+                if not retry:
+                    raise
+                # The dict changed under us mid-dump (Tk thread); try again shortly
+                self.set(self._settings)
+                return
+            version = self._submitted = self._version
+            _writer.submit(SETTINGS_JSON, lambda: self._write(data, version))
+
+    def _write(self, data, version):
+        """Runs on the writer thread."""
+        _atomic_write(SETTINGS_JSON, data)
+        with self._lock:
+            self._mtime = self._file_mtime()
+            if self._version == version:
+                self._pending = False
 
-    with open(SETTINGS_JSON, "w", encoding="utf-8") as file:
-        json.dump(settings, file, indent=2)
+    def flush(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._write_pending(retry=False)
+
+_settings_manager = SettingsManager()
+
+def load_settings():
+    """
+    Return the settings dict, cached in memory:
+    1) Ensure a settings file exists (create if missing).
+    2) Re-read it only if it changed on disk since the last read.
+    3) With the SQLite backend, in-progress entries come from the database.
+    """
+    return _settings_manager.get()
+
+def write_settings(settings):
+    """
+    Store `settings` as the current settings; the file is written shortly after
+    (coalescing rapid changes) or on flush().
+    """
+    _settings_manager.set(settings)
         
 def read_tags():
+    _writer.flush()  # Read our own queued write_tags()
     try:
-        with open(TAGS_JSON, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-        tags = {int(key): value for key, value in data.items()}
-        return tags
+        data = serializer.load_file(TAGS_JSON)
     except FileNotFoundError:
         print(f"Error: The file {TAGS_JSON} was not found.")
-    except json.JSONDecodeError as e:
+        return None
+    except ValueError as e:
         print(f"Error: Could not decode JSON. {e}")
+        return None
+    try:
+        tags = {int(key): value for key, value in data.items()}
+        return tags
     except ValueError as e:
         print(f"Error: Could not convert keys to integers. {e}")
 
 
 def write_tags(data):
+    _writer.submit(TAGS_JSON, lambda: _atomic_write(TAGS_JSON, serializer.dumps(data)))
+
+
+def load_cover_access():
+    """
+    Load {code: last viewed unix time} for cached covers. Missing or broken file -> {}.
+    """
+    settings = load_settings()
+    access_path = os.path.join(settings["paths"]["info_directory"], "cover_access.json")
     try:
-        with open(TAGS_JSON, 'w', encoding='utf-8') as file:
-            json.dump(data, file, indent=4, ensure_ascii=False)
-    except Exception as e:
-        print(f"Error: Could not write to file. {e}")
+        raw_dict = serializer.load_file(access_path)
+        return {int(code_str): ts for code_str, ts in raw_dict.items()}
+    except FileNotFoundError:
+        return {}
+    except ValueError as e:
+        print(f"Error: Could not read cover access times. {e}")
+        return {}
+
+
+def save_cover_access(access):
+    """
+    Save {code: last viewed unix time} for cached covers.
+    """
+    settings = load_settings()
+    access_path = os.path.join(settings["paths"]["info_directory"], "cover_access.json")
+    out_dict = {str(code): ts for code, ts in access.items()}
+    _writer.submit(access_path, lambda: _atomic_write(access_path, serializer.dumps(out_dict)))
@@ -0,0 +1,336 @@
+"""
+SQLite storage backend.
+
+Selected with settings["storage"]["backend"] = "sqlite"; data_manager_json routes
+its load/save functions here, so callers keep using `dm`. Codes, their tags,
+favorites, folders and in-progress entries live in indexed tables of one
+database in WAL mode, so single-code updates touch one row instead of
+rewriting a whole JSON file.
+
+The first time the database is opened, the JSON files are imported into it.
+To run that migration by hand:
+
+    python data_manager_sqlite.py migrate
+"""
+
+import os
+import sqlite3
+import logging
+import threading
+
+DB_FILE = "saucebrowser.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS codes (
+    code INTEGER PRIMARY KEY,
+    cover TEXT NOT NULL DEFAULT '',
+    visible INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS codes_visible ON codes (visible);
+CREATE TABLE IF NOT EXISTS code_tags (
+    code INTEGER NOT NULL,
+    tag INTEGER NOT NULL,
+    PRIMARY KEY (code, tag)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS code_tags_tag ON code_tags (tag, code);
+CREATE TABLE IF NOT EXISTS folders (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS favorites (
+    code INTEGER PRIMARY KEY,
+    name TEXT NOT NULL DEFAULT '',
+    folder_id INTEGER REFERENCES folders (id)
+);
+CREATE INDEX IF NOT EXISTS favorites_folder ON favorites (folder_id);
+CREATE TABLE IF NOT EXISTS favorite_tags (
+    code INTEGER NOT NULL,
+    tag INTEGER NOT NULL,
+    PRIMARY KEY (code, tag)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS in_progress (
+    code INTEGER PRIMARY KEY,
+    page TEXT NOT NULL DEFAULT ''
+);
+"""
+
+_databases = {}
+_databases_lock = threading.Lock()
+
+
+def connect(db_path):
+    """Return the shared Database for `db_path`, opening it on first use."""
+    db_path = os.path.abspath(db_path)
+    with _databases_lock:
+        if db_path not in _databases:
+            _databases[db_path] = Database(db_path)
+        return _databases[db_path]
+
+
+class Database:
+    """
+    One SQLite connection shared by the Tk thread and background threads.
+    Every public method runs under a lock and commits before returning.
+    """
+
+    def __init__(self, db_path):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.path = db_path
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+        self.lock = threading.RLock()
+        self._migrated = False
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    # ---- meta ----
+
+    def get_meta(self, key, default=None):
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def is_migrated(self):
+        if not self._migrated:
+            self._migrated = self.get_meta("migrated_from_json") == "1"
+        return self._migrated
+
+    # ---- codes ----
+
+    def load_codes(self):
+        """Return {code: {"tags": set, "cover": str, "visible": int}}, like load_codes_json."""
+        with self.lock:
+            final_dict = {
+                code: {"tags": set(), "cover": cover, "visible": visible}
+                for code, cover, visible in self.conn.execute("SELECT code, cover, visible FROM codes")
+            }
+            for code, tag in self.conn.execute("SELECT code, tag FROM code_tags"):
+                final_dict[code]["tags"].add(tag)
+        return final_dict
+
+    def codes_generation(self):
+        """
+        Counter bumped by every change to the codes table other than a
+        visibility flag; the binary code snapshot is stamped with it.
+        """
+        return int(self.get_meta("codes_generation", 0))
+
+    def _bump_codes_generation(self):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('codes_generation', "
+            "COALESCE((SELECT value FROM meta WHERE key = 'codes_generation'), 0) + 1)"
+        )
+
+    def save_codes(self, codes_dict):
+        """
+        Replace every code with the contents of `codes_dict`. Only for the
+        migration; later changes go through upsert_codes and the set_* methods.
+        """
+        with self.lock, self.conn:
+            self._bump_codes_generation()
+            self.conn.execute("DELETE FROM code_tags")
+            self.conn.execute("DELETE FROM codes")
+            self.conn.executemany(
+                "INSERT INTO codes (code, cover, visible) VALUES (?, ?, ?)",
+                (
+                    (code, data_obj.get("cover") or "", data_obj.get("visible", 1))
+                    for code, data_obj in codes_dict.items()
+                )
+            )
+            self.conn.executemany(
+                "INSERT INTO code_tags (code, tag) VALUES (?, ?)",
+                (
+                    (code, tag)
+                    for code, data_obj in codes_dict.items()
+                    for tag in data_obj.get("tags", ())
+                )
+            )
+
+    def upsert_codes(self, rows):
+        """
+        Add or update the codes in `rows`, (code, tags, cover, visible) tuples,
+        touching only their rows. A code already stored keeps its visible flag
+        (set_code_visible persists that as it changes); its tags and cover are
+        replaced.
+        """
+        rows = list(rows)
+        if not rows:
+            return
+        with self.lock, self.conn:
+            self._bump_codes_generation()
+            self.conn.executemany(
+                "INSERT INTO codes (code, cover, visible) VALUES (?, ?, ?) "
+                "ON CONFLICT (code) DO UPDATE SET cover = excluded.cover",
+                ((code, cover or "", visible) for code, tags, cover, visible in rows)
+            )
+            self.conn.executemany("DELETE FROM code_tags WHERE code = ?", ((row[0],) for row in rows))
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO code_tags (code, tag) VALUES (?, ?)",
+                ((code, tag) for code, tags, cover, visible in rows for tag in tags)
+            )
+
+    def set_code_visible(self, code, visible):
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE codes SET visible = ? WHERE code = ?", (visible, code))
+
+    def set_all_codes_visible(self):
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE codes SET visible = 1 WHERE visible != 1")
+
+    def set_code_cover(self, code, cover):
+        self.set_code_covers([(code, cover)])
+
+    def set_code_covers(self, covers):
+        """Set the cover of each (code, cover) pair in `covers`, in one transaction."""
+        covers = list(covers)
+        if not covers:
+            return
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "UPDATE codes SET cover = ? WHERE code = ?",
+                ((cover or "", code) for code, cover in covers)
+            )
+            self._bump_codes_generation()
+
+    def hidden_codes(self):
+        with self.lock:
+            return [row[0] for row in self.conn.execute("SELECT code FROM codes WHERE visible != 1")]
+
+    # ---- favorites ----
+
+    def load_favorites(self):
+        """Return {code: {"tags": set, "name": str, "folder": str or None}}, like load_favorite_json."""
+        with self.lock:
+            final_dict = {
+                code: {"tags": set(), "name": name, "folder": folder}
+                for code, name, folder in self.conn.execute(
+                    "SELECT f.code, f.name, d.name FROM favorites f LEFT JOIN folders d ON d.id = f.folder_id"
+                )
+            }
+            for code, tag in self.conn.execute("SELECT code, tag FROM favorite_tags"):
+                if code in final_dict:
+                    final_dict[code]["tags"].add(tag)
+        return final_dict
+
+    def _folder_id(self, folder):
+        """Return the id of folder `folder`, creating it if needed. Blank folders map to NULL."""
+        if not folder:
+            return None
+        self.conn.execute("INSERT OR IGNORE INTO folders (name) VALUES (?)", (folder,))
+        return self.conn.execute("SELECT id FROM folders WHERE name = ?", (folder,)).fetchone()[0]
+
+    def _put_favorite(self, code, data_obj):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO favorites (code, name, folder_id) VALUES (?, ?, ?)",
+            (code, data_obj.get("name", ""), self._folder_id(data_obj.get("folder")))
+        )
+        self.conn.execute("DELETE FROM favorite_tags WHERE code = ?", (code,))
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO favorite_tags (code, tag) VALUES (?, ?)",
+            ((code, tag) for tag in data_obj.get("tags", ()))
+        )
+
+    def add_favorites(self, code_dict):
+        """Insert or replace the favorites in `code_dict`."""
+        with self.lock, self.conn:
+            for code, data_obj in code_dict.items():
+                self._put_favorite(code, data_obj)
+
+    def save_favorites(self, codes_dict):
+        """Replace every favorite with the contents of `codes_dict`."""
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM favorite_tags")
+            self.conn.execute("DELETE FROM favorites")
+            for code, data_obj in codes_dict.items():
+                self._put_favorite(code, data_obj)
+            self._drop_empty_folders()
+
+    def remove_favorite(self, code):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM favorite_tags WHERE code = ?", (code,))
+            self.conn.execute("DELETE FROM favorites WHERE code = ?", (code,))
+            self._drop_empty_folders()
+
+    def set_favorite_folder(self, code, folder):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE favorites SET folder_id = ? WHERE code = ?",
+                (self._folder_id(folder), code)
+            )
+            self._drop_empty_folders()
+
+    def _drop_empty_folders(self):
+        self.conn.execute(
+            "DELETE FROM folders WHERE id NOT IN (SELECT folder_id FROM favorites WHERE folder_id IS NOT NULL)"
+        )
+
+    # ---- in progress ----
+
+    def load_in_progress(self):
+        """Return {str(code): page}, the shape settings["in_progress"] has always had."""
+        with self.lock:
+            return {str(code): page for code, page in self.conn.execute("SELECT code, page FROM in_progress")}
+
+    def set_in_progress(self, code, page):
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO in_progress (code, page) VALUES (?, ?)", (int(code), page))
+
+    def clear_in_progress(self, code):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM in_progress WHERE code = ?", (int(code),))
+
+    # ---- migration ----
+
+    def migrate_from_json(self, codes_dict, favorites_dict, in_progress):
+        """
+        One-time import of the JSON data. Marks the database as migrated so it
+        is never imported twice.
+        """
+        self.save_codes(codes_dict)
+        self.save_favorites(favorites_dict)
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM in_progress")
+            self.conn.executemany(
+                "INSERT INTO in_progress (code, page) VALUES (?, ?)",
+                ((int(code), page) for code, page in in_progress.items())
+            )
+        self.set_meta("migrated_from_json", 1)
+        self._migrated = True
+        logging.info(
+            f"[sqlite] Migrated {len(codes_dict)} codes, {len(favorites_dict)} favorites "
+            f"and {len(in_progress)} in-progress entries from JSON."
+        )
+
+
+def main():
+    import argparse
+    import data_manager_json as dm
+
+    parser = argparse.ArgumentParser(description="Maintain the SQLite storage backend.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    migrate = sub.add_parser("migrate", help="Import the JSON files into the database.")
+    migrate.add_argument("--force", action="store_true", help="Re-import even if already migrated.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    if args.command == "migrate":
+        count = dm.migrate_json_to_sqlite(force=args.force)
+        print(f"Migrated {count} codes into the SQLite database.")
+
+
+if __name__ == "__main__":
+    main()
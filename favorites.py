@@ -0,0 +1,206 @@
+"""
+In-memory favorites, loaded once and kept in step with storage.
+
+The controller owns a single FavoritesRepository. Pages read it like a dict
+({code: {"tags": set, "name": str, "folder": str or None}}), change it
+through add / remove / set_folder, which persist the change through dm, and
+subscribe to hear about changes instead of re-reading favorite_codes.json.
+
+    favorites = FavoritesRepository.load()
+    favorites.subscribe(lambda op, code: print(op, code))
+    favorites.add(177013, tags={8, 12}, name="...")   # -> "add 177013"
+
+Subscribers are called with (op, code), op being "add", "remove" or
+"folder", on the thread that made the change (the Tk thread in the app).
+
+The repository also keeps a few indexes up to date on every change: how many
+favorites carry each tag (tag_count), each favorite's casefolded name (its
+alphabetical sort_key), the favorites in name order (ordered), and the
+folders with their favorites and the favorite whose cover stands for each
+folder (folders, folder_codes, folder_cover).
+"""
+
+import logging
+from collections import Counter
+from collections.abc import Mapping
+
+import data_manager_json as dm
+
+
+class FavoritesRepository(Mapping):
+    def __init__(self, favorites=None):
+        self._favorites = dict(favorites or {})
+        self._subscribers = []
+        self.version = 0             # Bumped by every change
+        self._tag_counts = Counter()
+        self._sort_keys = {}         # code -> casefolded name
+        self._folders = {}           # casefolded folder -> {"name": folder as first written, "codes": {code: None}}
+        self._ordered = None         # Codes by sort key, rebuilt on first use after a change
+        for code, entry in self._favorites.items():
+            self._index(code, entry)
+
+    @classmethod
+    def load(cls):
+        """Read the favorites from the configured storage backend."""
+        return cls(dm.load_favorite_json())
+
+    # ----- Mapping (read-only; entries must not be modified in place) -----
+
+    def __getitem__(self, code):
+        return self._favorites[code]
+
+    def __contains__(self, code):
+        return code in self._favorites
+
+    def __iter__(self):
+        return iter(self._favorites)
+
+    def __len__(self):
+        return len(self._favorites)
+
+    # ----- Change notifications -----
+
+    def subscribe(self, callback):
+        """Call `callback(op, code)` after every change."""
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def _notify(self, op, code):
+        self.version += 1
+        for callback in list(self._subscribers):
+            try:
+                callback(op, code)
+            except Exception as e:
+                logging.error(f"[favorites] Subscriber failed on {op} {code}: {e}", exc_info=True)
+
+    # ----- Indexes -----
+
+    @staticmethod
+    def _folder_key(folder):
+        return str(folder or "").strip().casefold()
+
+    def _index(self, code, entry):
+        self._tag_counts.update(entry.get("tags", ()))
+        self._sort_keys[code] = str(entry.get("name", "")).casefold()
+        key = self._folder_key(entry.get("folder"))
+        if key:
+            folder = self._folders.setdefault(key, {"name": str(entry["folder"]).strip(), "codes": {}})
+            folder["codes"][code] = None
+        self._ordered = None
+
+    def _unindex(self, code, entry):
+        self._tag_counts.subtract(entry.get("tags", ()))
+        del self._sort_keys[code]
+        key = self._folder_key(entry.get("folder"))
+        if key:
+            codes = self._folders[key]["codes"]
+            del codes[code]
+            if not codes:
+                del self._folders[key]
+        self._ordered = None
+
+    # ----- Changes (persisted through dm) -----
+
+    def add(self, code, tags=(), name="", folder=None):
+        """Add (or replace) a favorite."""
+        entry = {"tags": set(tags), "name": name, "folder": folder}
+        old = self._favorites.get(code)
+        if old is not None:
+            self._unindex(code, old)
+        self._favorites[code] = entry
+        self._index(code, entry)
+        dm.add_favorite(code, entry)
+        self._notify("add", code)
+
+    def remove(self, code):
+        """Remove a favorite, if present."""
+        entry = self._favorites.pop(code, None)
+        if entry is None:
+            return
+        self._unindex(code, entry)
+        dm.remove_favorite(code)
+        self._notify("remove", code)
+
+    def set_folder(self, code, folder):
+        """Move a favorite into `folder` ("" or None takes it out of any folder)."""
+        entry = self._favorites.get(code)
+        if entry is None:
+            return
+        self._unindex(code, entry)
+        self._favorites[code] = {**entry, "folder": folder}
+        self._index(code, self._favorites[code])
+        dm.set_favorite_folder(code, folder)
+        self._notify("folder", code)
+
+    # ----- Queries -----
+
+    def tag_count(self, tag_id):
+        """How many favorites carry `tag_id`."""
+        return self._tag_counts[tag_id]
+
+    def tag_counts(self):
+        """{tag id: favorites carrying it}, kept up to date by add / remove. Do not modify it."""
+        return self._tag_counts
+
+    def sort_key(self, code):
+        """The favorite's name, casefolded, for sorting alphabetically."""
+        return self._sort_keys[code]
+
+    def ordered(self):
+        """Every favorite's code, alphabetically by name. Do not modify it."""
+        if self._ordered is None:
+            self._ordered = sorted(self._sort_keys, key=self._sort_keys.__getitem__)
+        return self._ordered
+
+    def folders(self):
+        """{casefolded folder: folder name as first written} for every folder in use."""
+        return {key: folder["name"] for key, folder in self._folders.items()}
+
+    def folder_codes(self, folder):
+        """Codes of the favorites in `folder` (case-insensitive), in the order they were put there."""
+        folder = self._folders.get(self._folder_key(folder))
+        return list(folder["codes"]) if folder else []
+
+    def folder_cover(self, folder):
+        """The code whose cover stands for `folder`: the first favorite put in it still there."""
+        folder = self._folders.get(self._folder_key(folder))
+        return next(iter(folder["codes"])) if folder else None
+
+    def folder(self, code):
+        """The folder `code` is in, or "" if none (or not a favorite)."""
+        entry = self._favorites.get(code)
+        return (entry and entry.get("folder")) or ""
+
+    def query(self, name="", tag_ids=(), folder="", tag_query=None, ordered=False):
+        """
+        [(code, entry)] for the favorites whose name contains `name`, that have
+        any of `tag_ids` and whose folder contains `folder` (all case-insensitive;
+        an empty filter matches everything). `tag_query`, a compiled
+        tag_query.Plan, must also match the favorite's tags if given. With
+        `ordered`, the results come alphabetically by name.
+        """
+        name = name.casefold()
+        folder = folder.casefold()
+        tag_ids = set(tag_ids)
+        codes = self.ordered() if ordered else self._favorites
+        if folder:
+            in_folders = {
+                code
+                for key, entry in self._folders.items() if folder in key
+                for code in entry["codes"]
+            }
+            codes = [code for code in codes if code in in_folders]
+        matches = []
+        for code in codes:
+            entry = self._favorites[code]
+            if name and name not in self._sort_keys[code]:
+                continue
+            if tag_ids and tag_ids.isdisjoint(entry.get("tags", ())):
+                continue
+            if tag_query is not None and not tag_query.matches(entry.get("tags", ())):
+                continue
+            matches.append((code, entry))
+        return matches
@@ -0,0 +1,50 @@
+"""
+Small LRU cache for filter and search results.
+
+Pages key each result on everything it depends on: the normalized query, the
+sort mode and the version counters of the data it was computed from
+(CodeStore, FavoritesRepository and TagNameIndex each bump `version` on every
+change). A change simply makes later lookups miss; nothing has to be
+invalidated, and entries for old versions age out of the cache.
+
+    cache = QueryCache(maxsize=32)
+    items = cache.get(("favorites", normalize(query), sort, favorites.version), lambda: search(query, sort))
+
+Cached values are shared between callers and must not be modified.
+"""
+
+from collections import OrderedDict
+
+
+def normalize(query):
+    """`query` with surrounding and repeated whitespace dropped, for use in keys."""
+    return " ".join(query.split())
+
+
+class QueryCache:
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()    # key -> value, least recently used first
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, compute):
+        """The value cached under `key`, or `compute()`'s result, cached if it doesn't raise."""
+        try:
+            value = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            value = compute()
+            self._entries[key] = value
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+            return value
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def clear(self):
+        self._entries.clear()
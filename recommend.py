@@ -0,0 +1,136 @@
+"""
+"More like my favorites": ranks the visible codes by how well their tags match
+the tags of the favorites.
+
+Every code is a row of a sparse code x tag matrix X with TF-IDF weights: a
+code lists each tag once, so a tag weighs its idf, log(codes / (1 + codes
+carrying it)), and each row is scaled to unit length. The store's columns
+already are X in CSR form (tag_offsets / tag_ids); only the idf vector and
+the row norms are kept alongside. The favorites' profile p is the sum of
+their rows, and a code's score is its row of X . p, so ranking the whole
+catalog is one sparse matrix-vector product over the tag column.
+
+    recommender = Recommender(code_store, favorites)
+    recommender.top(6)                    # [codes], best match first
+    recommender.top(6, where=mask)        # among the rows of a filter mask
+
+The profile follows the favorites through their change notifications: adding
+or removing one adds or subtracts its row. The idf and norms are recomputed
+(and the profile rebuilt) only when the store merges new codes in.
+"""
+
+import numpy as np
+
+
+class Recommender:
+    def __init__(self, code_store, favorites):
+        self.code_store = code_store
+        self.favorites = favorites
+        self._cols = None           # Columns the weights below were computed for
+        self._idf = None            # float32[tag slots]
+        self._row_norm = None       # float32[n]: length of each code's TF-IDF row
+        self._profile = None        # float64[tag slots]: sum of the favorites' rows
+        self._members = {}          # favorite code -> tag ids counted in the profile
+        favorites.subscribe(self._favorite_changed)
+
+    def close(self):
+        self.favorites.unsubscribe(self._favorite_changed)
+
+    # ----- model -----
+
+    def _refresh(self):
+        """Recompute the weights if the store's columns changed since last time."""
+        cols = self.code_store.columns()
+        if cols is self._cols:
+            return cols
+        postings = self.code_store.tag_postings()
+        df = np.diff(postings.offsets)
+        # With no codes there is nothing to weigh: log(0) would only warn
+        self._idf = np.log(max(len(cols.codes), 1) / (1.0 + df)).clip(min=0).astype(np.float32)
+        self._row_norm = np.sqrt(_row_sums(self._idf ** 2, cols))
+        self._cols = cols
+        self._rebuild_profile()
+        return cols
+
+    def _favorite_row(self, tag_ids):
+        """(tag ids, weights) of the TF-IDF row of a code carrying `tag_ids`."""
+        tag_ids = np.fromiter(tag_ids, dtype=np.int64)
+        tag_ids = tag_ids[(tag_ids >= 0) & (tag_ids < len(self._idf))]
+        weights = self._idf[tag_ids].astype(np.float64)
+        norm = np.sqrt(np.dot(weights, weights))
+        return tag_ids, (weights / norm if norm else weights)
+
+    def _rebuild_profile(self):
+        self._profile = np.zeros(len(self._idf), dtype=np.float64)
+        self._members = {}
+        for code, entry in self.favorites.items():
+            self._add_member(code, entry.get("tags", ()))
+
+    def _add_member(self, code, tags):
+        tag_ids, weights = self._favorite_row(tags)
+        self._profile[tag_ids] += weights
+        self._members[code] = tuple(tag_ids)
+
+    def _remove_member(self, code):
+        tag_ids = self._members.pop(code, None)
+        if tag_ids is not None:
+            tag_ids, weights = self._favorite_row(tag_ids)
+            self._profile[tag_ids] -= weights
+
+    def _favorite_changed(self, op, code):
+        if self._profile is None or op == "folder":
+            return
+        self._remove_member(code)
+        if op == "add" and code in self.favorites:
+            self._add_member(code, self.favorites[code].get("tags", ()))
+
+    # ----- ranking -----
+
+    def scores(self):
+        """float32[n]: score of every row of the store's columns (0 for no shared tag)."""
+        cols = self._refresh()
+        query = (self._idf * self._profile).astype(np.float32)
+        raw = _row_sums(query, cols)
+        return np.divide(raw, self._row_norm, out=np.zeros_like(raw), where=self._row_norm > 0)
+
+    def top(self, k, where=None, exclude=()):
+        """
+        Up to `k` visible codes with the best scores, best first, leaving out
+        favorites, codes in `exclude` and codes with nothing in common with the
+        favorites. With `where` (a bool mask over the rows of the store's
+        columns, e.g. from a tag_query plan), only those rows.
+        """
+        scores = self.scores()
+        cols = self._cols
+        if len(cols.codes) == 0:
+            return []
+        candidates = self.code_store.visible_mask()
+        if where is not None:
+            candidates &= where
+        candidates &= scores > 0
+        skip = np.fromiter(self._members, dtype=np.int64)
+        if exclude:
+            skip = np.concatenate((skip, np.fromiter(exclude, dtype=np.int64)))
+        if len(skip):
+            rows = np.searchsorted(cols.codes, skip).clip(max=len(cols.codes) - 1)
+            candidates[rows[cols.codes[rows] == skip]] = False
+
+        rows = np.flatnonzero(candidates)
+        k = min(k, len(rows))
+        if k == 0:
+            return []
+        best = rows[np.argpartition(scores[rows], -k)[-k:]]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return cols.codes[best].tolist()
+
+
+def _row_sums(values, cols):
+    """For every row of `cols`, the sum of values[t] over its tags t."""
+    lengths = np.diff(cols.tag_offsets)
+    # A trailing zero gives every row start, even past the last tag, an index
+    # into the array, so rows before trailing tagless rows keep their full sum
+    padded = np.zeros(len(cols.tag_ids) + 1, dtype=values.dtype)
+    padded[:-1] = values[cols.tag_ids]
+    sums = np.add.reduceat(padded, cols.tag_offsets[:-1]) if len(lengths) else padded[:0]
+    sums[lengths == 0] = 0
+    return sums
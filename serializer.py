@@ -0,0 +1,86 @@
+"""
+JSON encoding for everything dm writes.
+
+Uses orjson if it is installed, else msgspec, else the stdlib json module;
+all three read and write the same files. Output is compact unless `pretty` is
+asked for (settings.json, which people edit by hand), and always UTF-8 bytes.
+Non-string dict keys (code and tag ids) are written as strings.
+
+    import serializer
+    data = serializer.dumps(obj)
+    obj = serializer.loads(data)
+
+Decode errors are raised as ValueError whatever the backend. The cyclic
+garbage collector is paused while decoding: a large file creates millions of
+containers, none of them cyclic, and collections triggered by the allocations
+would otherwise take more time than the decoding itself.
+"""
+
+import gc
+import json
+from contextlib import contextmanager
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+if orjson is not None:
+    BACKEND = "orjson"
+elif msgspec is not None:
+    BACKEND = "msgspec"
+else:
+    BACKEND = "json"
+
+if msgspec is not None:
+    _msgspec_encoder = msgspec.json.Encoder()
+    _msgspec_decoder = msgspec.json.Decoder()
+
+
+def dumps(obj, pretty=False):
+    """Encode `obj` as JSON bytes."""
+    if BACKEND == "orjson":
+        option = orjson.OPT_NON_STR_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, option=option)
+    if BACKEND == "msgspec" and not pretty:
+        return _msgspec_encoder.encode(obj)
+    if pretty:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode("utf-8")
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+@contextmanager
+def _gc_paused():
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def loads(data):
+    """Decode JSON from bytes or str."""
+    with _gc_paused():
+        if BACKEND == "orjson":
+            return orjson.loads(data)
+        if BACKEND == "msgspec":
+            try:
+                return _msgspec_decoder.decode(data)
+            except msgspec.DecodeError as e:
+                raise ValueError(str(e)) from e
+        return json.loads(data)
+
+
+def load_file(path):
+    """Decode the JSON file at `path`."""
+    with open(path, "rb") as f:
+        return loads(f.read())
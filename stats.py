@@ -0,0 +1,97 @@
+"""
+Statistics for the Statistics page, computed with NumPy from the code store's
+columns and tag index.
+
+    stats = CodeStats(code_store, favorites)
+    stats.top_tags(10)              # [(tag id, visible codes carrying it)]
+    stats.top_favorite_tags(10)     # [(tag id, favorites carrying it)]
+    stats.co_occurring(tag_id, 10)  # [(tag id, visible codes carrying both)]
+    stats.ban_share()               # (codes hidden by bans, codes marked visible)
+
+Visible tag frequencies are kept by the store itself (visible_tag_counts):
+counted once from the tag index, then adjusted by each hide or show, so
+reading them is free; the favorites keep their own (tag_counts).
+Co-occurrence and the arrays built from the favorites' counts are computed
+on demand and cached against the store's and the favorites' version
+counters, one entry per statistic (co-occurrence keeps only the last tag).
+"""
+
+import numpy as np
+
+from code_store import _gather_rows
+
+
+def _top(counts, k, exclude=()):
+    """[(index, count)] of the `k` largest non-zero entries of `counts`, largest first."""
+    counts = counts.copy()
+    for i in exclude:
+        if 0 <= i < len(counts):
+            counts[i] = 0
+    k = min(k, int(np.count_nonzero(counts)))
+    if k == 0:
+        return []
+    top = np.argpartition(counts, -k)[-k:]
+    top = top[np.argsort(-counts[top], kind="stable")]
+    return [(int(i), int(counts[i])) for i in top]
+
+
+class CodeStats:
+    def __init__(self, code_store, favorites):
+        self.code_store = code_store
+        self.favorites = favorites
+        self._cache = {}                 # name -> (versions and key, value)
+
+    def _cached(self, name, compute, key=None):
+        """compute()'s value, kept under `name` until the versions or `key` change."""
+        stamp = (self.code_store.version, self.favorites.version, key)
+        hit = self._cache.get(name)
+        if hit is not None and hit[0] == stamp:
+            return hit[1]
+        value = compute()
+        self._cache[name] = (stamp, value)
+        return value
+
+    def tag_frequency(self):
+        """int64[max tag id + 1]: number of visible codes carrying each tag."""
+        return self.code_store.visible_tag_counts()
+
+    def favorite_tag_frequency(self):
+        """int64[max tag id + 1]: number of favorites carrying each tag."""
+        def compute():
+            counts = {tag_id: n for tag_id, n in self.favorites.tag_counts().items() if n > 0}
+            frequency = np.zeros(max(counts, default=0) + 1, dtype=np.int64)
+            frequency[np.fromiter(counts.keys(), dtype=np.int64)] = np.fromiter(counts.values(), dtype=np.int64)
+            return frequency
+        return self._cached("favorite_tag_frequency", compute)
+
+    def top_tags(self, k=10):
+        return _top(self.tag_frequency(), k)
+
+    def top_favorite_tags(self, k=10):
+        return _top(self.favorite_tag_frequency(), k)
+
+    def co_occurring(self, tag_id, k=10):
+        """The `k` tags most often found on visible codes that also carry `tag_id`."""
+        def compute():
+            postings = self.code_store.tag_postings()
+            cols = self.code_store.columns()
+            shown = self.code_store.visible_mask()
+            rows = postings.rows_for((tag_id,))
+            rows = rows[shown[rows]]
+            if len(rows) * 8 > len(shown):
+                # Common tag: one sequential pass over the tag column beats gathering
+                with_tag = np.zeros(len(shown), dtype=bool)
+                with_tag[rows] = True
+                tags = cols.tag_ids[np.repeat(with_tag, np.diff(cols.tag_offsets))]
+            else:
+                starts = cols.tag_offsets[rows]
+                _, tags = _gather_rows(cols.tag_ids, starts, cols.tag_offsets[rows + 1] - starts)
+            return np.bincount(tags, minlength=1)
+        return _top(self._cached("co_occurring", compute, key=tag_id), k, exclude=(tag_id,))
+
+    def ban_share(self):
+        """(codes hidden by banned tags, codes marked visible)."""
+        def compute():
+            marked = int(np.count_nonzero(self.code_store.columns().visible))
+            return self.code_store.ban_hidden_count(), marked
+        return self._cached("ban_share", compute)
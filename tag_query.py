@@ -0,0 +1,304 @@
+"""
+Boolean tag queries for the filter boxes.
+
+    big -tag:english (color OR "full color")
+
+A word matches the codes carrying any tag whose name contains it (what the
+filter boxes always did); "quotes" allow spaces; tag:name matches only the
+tag named exactly that, and a number the tag with that id. Terms next to each
+other must all match; OR (or | or ,) takes either side, NOT (or a leading -)
+the opposite, and parentheses group. Operators are in capitals; AND binds
+tighter than OR.
+
+A query is parsed and its words resolved to tag ids once, by compile_query.
+The Plan it returns orders every AND most selective term first, using the
+number of codes carrying each tag (the app passes the store's visible tag
+counts), and the terms of every OR most common first. It then evaluates against either:
+
+    plan.mask(code_store)       # bool mask over code_store.columns() rows
+    plan.matches(tag_set)       # one set of tags, e.g. a favorite's
+
+mask() starts each AND from its most selective term's rows and checks the
+later terms only against the rows still left: through the tag column for a
+handful of rows, or through a bitmap of the term's postings when that is
+cheaper. matches() stops at the first term that decides the answer.
+"""
+
+import re
+
+import numpy as np
+
+from code_store import _gather_rows
+
+
+class QueryError(ValueError):
+    """The query could not be parsed."""
+
+
+_TOKEN = re.compile(r'\s*(?:([(),|])|(-)(?=\S)|((?:tag:)?"[^"]*"?)|([^\s(),|"]+))')
+
+
+def _tokenize(query):
+    tokens = []
+    pos = 0
+    query = query.rstrip()
+    while pos < len(query):
+        match = _TOKEN.match(query, pos)
+        if match is None or match.end() == pos:
+            raise QueryError(f"Unexpected {query[pos:].strip()[:1]!r} at position {pos + 1}")
+        punct, minus, quoted, word = match.groups()
+        if punct:
+            tokens.append("OR" if punct in ",|" else punct)
+        elif minus:
+            tokens.append("NOT")
+        elif quoted:
+            exact = quoted.startswith("tag:")
+            tokens.append(("tag", quoted[4 if exact else 0:].strip('"'), exact))
+        elif word in ("AND", "OR", "NOT"):
+            tokens.append(word)
+        elif word.startswith("tag:"):
+            tokens.append(("tag", word[4:], True))
+        else:
+            tokens.append(("tag", word, False))
+        pos = match.end()
+    return tokens
+
+
+# ----- syntax tree, which is also the plan -----
+
+class Term:
+    """Codes carrying any of `tag_ids`."""
+
+    def __init__(self, text, tag_ids):
+        self.text = text
+        self.tag_ids = frozenset(tag_ids)
+        self.size = 0                # Codes carrying one of the tags (an upper bound), set by compile_query
+
+    def __repr__(self):
+        return f"Term({self.text!r}, {sorted(self.tag_ids)})"
+
+
+class Not:
+    def __init__(self, child):
+        self.child = child
+        self.size = 0
+
+    def __repr__(self):
+        return f"Not({self.child!r})"
+
+
+class All:
+    def __init__(self, children):
+        self.children = children
+        self.size = 0
+
+    def __repr__(self):
+        return f"All({self.children!r})"
+
+
+class Any:
+    def __init__(self, children):
+        self.children = children
+        self.size = 0
+
+    def __repr__(self):
+        return f"Any({self.children!r})"
+
+
+class _Parser:
+    def __init__(self, tokens, resolve):
+        self.tokens = tokens
+        self.pos = 0
+        self.resolve = resolve
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def take(self):
+        token = self.peek()
+        self.pos += 1
+        return token
+
+    def parse(self):
+        node = self.parse_or()
+        if self.peek() is not None:
+            raise QueryError(f"Unexpected {self.peek()!r}")
+        return node
+
+    def parse_or(self):
+        children = [self.parse_and()]
+        while self.peek() == "OR":
+            self.take()
+            children.append(self.parse_and())
+        return children[0] if len(children) == 1 else Any(children)
+
+    def parse_and(self):
+        children = []
+        while self.peek() not in (None, "OR", ")"):
+            if self.peek() == "AND":
+                self.take()
+                continue
+            children.append(self.parse_unary())
+        if not children:
+            raise QueryError("Expected a tag")
+        return children[0] if len(children) == 1 else All(children)
+
+    def parse_unary(self):
+        token = self.take()
+        if token == "NOT":
+            if self.peek() in (None, "OR", ")", "AND"):
+                raise QueryError("Expected a tag after NOT")
+            return Not(self.parse_unary())
+        if token == "(":
+            node = self.parse_or()
+            if self.take() != ")":
+                raise QueryError("Missing )")
+            return node
+        if isinstance(token, tuple):
+            _, text, exact = token
+            return Term(("tag:" if exact else "") + text, self.resolve(text, exact))
+        raise QueryError(f"Unexpected {token!r}")
+
+
+# ----- compiling -----
+
+class Plan:
+    def __init__(self, root, text):
+        self.root = root
+        self.text = text
+
+    def __repr__(self):
+        return f"Plan({self.root!r})"
+
+    def matches(self, tags):
+        """Whether a code carrying `tags` (a set) matches the query."""
+        return _matches(self.root, tags)
+
+    def mask(self, code_store, visible_only=True):
+        """Bool mask over the rows of code_store.columns(): the codes matching the query."""
+        postings = code_store.tag_postings()
+        cols = code_store.columns()
+        within = code_store.visible_mask() if visible_only else None
+        return _evaluate(self.root, within, _Context(cols, postings))
+
+
+def compile_query(query, tag_index, tag_counts=None):
+    """
+    Parse `query` into a Plan, resolving words through `tag_index` (a
+    TagNameIndex). `tag_counts[t]` (e.g. CodeStore.visible_tag_counts()) is
+    the number of codes carrying tag t, used to order the terms;
+    without it every tag counts the same. Raises QueryError on a bad query.
+    """
+    def resolve(text, exact):
+        if text.isdigit():
+            return [int(text)]
+        if exact:
+            folded = text.casefold()
+            return [t for t in tag_index.search(text) if tag_index.tags[t].casefold() == folded]
+        return tag_index.search(text)
+
+    tokens = _tokenize(query)
+    if not tokens:
+        raise QueryError("Empty query")
+    root = _Parser(tokens, resolve).parse()
+    if tag_counts is None:
+        total = 1
+        count = lambda t: 1
+    else:
+        total = int(tag_counts.sum()) if len(tag_counts) else 0   # Bounds any term's size
+        count = lambda t: int(tag_counts[t]) if 0 <= t < len(tag_counts) else 0
+    _order(root, count, total)
+    return Plan(root, query)
+
+
+def _order(node, count, total):
+    """Set each node's size estimate and sort the children of ANDs and ORs."""
+    if isinstance(node, Term):
+        node.size = sum(count(t) for t in node.tag_ids)
+    elif isinstance(node, Not):
+        _order(node.child, count, total)
+        node.size = max(total - node.child.size, 0)
+    elif isinstance(node, All):
+        for child in node.children:
+            _order(child, count, total)
+        # Positive terms first (they give the starting rows), then by size
+        node.children.sort(key=lambda child: (isinstance(child, Not), child.size))
+        node.size = node.children[0].size
+    else:
+        for child in node.children:
+            _order(child, count, total)
+        node.children.sort(key=lambda child: -child.size)
+        node.size = min(sum(child.size for child in node.children), total)
+
+
+def _matches(node, tags):
+    if isinstance(node, Term):
+        return not node.tag_ids.isdisjoint(tags)
+    if isinstance(node, Not):
+        return not _matches(node.child, tags)
+    if isinstance(node, All):
+        return all(_matches(child, tags) for child in node.children)
+    return any(_matches(child, tags) for child in node.children)
+
+
+# ----- evaluating over the store -----
+
+class _Context:
+    def __init__(self, cols, postings):
+        self.cols = cols
+        self.postings = postings
+        self.n = len(cols.codes)
+        self.slots = len(postings.offsets) - 1
+        self.mean_tags = len(cols.tag_ids) / max(self.n, 1)
+
+    def posting_size(self, term):
+        return sum(
+            int(self.postings.offsets[t + 1] - self.postings.offsets[t])
+            for t in term.tag_ids if 0 <= t < self.slots
+        )
+
+    def bitmap(self, term):
+        bitmap = np.zeros(self.n, dtype=bool)
+        bitmap[self.postings.rows_for(term.tag_ids)] = True
+        return bitmap
+
+    def term_mask(self, term, within):
+        """Rows carrying any of the term's tags, among `within` (a mask, or None for all)."""
+        if within is None:
+            return self.bitmap(term)
+        if np.count_nonzero(within) * self.mean_tags >= self.posting_size(term):
+            return self.bitmap(term) & within
+        # Few rows left: look at their own tags instead of the term's postings
+        rows = np.flatnonzero(within)
+        lengths = self.cols.tag_offsets[rows + 1] - self.cols.tag_offsets[rows]
+        offsets, tags = _gather_rows(self.cols.tag_ids, self.cols.tag_offsets[rows], lengths)
+        hits = np.zeros(len(tags) + 1, dtype=np.int64)
+        np.cumsum(np.isin(tags, np.fromiter(term.tag_ids, dtype=np.int64, count=len(term.tag_ids))), out=hits[1:])
+        mask = np.zeros(self.n, dtype=bool)
+        mask[rows[hits[offsets[1:]] > hits[offsets[:-1]]]] = True
+        return mask
+
+
+def _evaluate(node, within, ctx):
+    """Mask of the rows matching `node` among `within` (a mask, or None for every row)."""
+    if isinstance(node, Term):
+        return ctx.term_mask(node, within)
+    if isinstance(node, Not):
+        excluded = _evaluate(node.child, within, ctx)
+        return ~excluded if within is None else within & ~excluded
+    if isinstance(node, All):
+        for child in node.children:
+            within = _evaluate(child, within, ctx)
+            if not within.any():
+                break
+        return within
+    # Any: each child only has to look at the rows no earlier child matched
+    matched = np.zeros(ctx.n, dtype=bool)
+    left = within
+    for child in node.children:
+        rows = _evaluate(child, left, ctx)
+        matched |= rows
+        left = ~matched if within is None else within & ~matched
+        if not left.any():
+            break
+    return matched
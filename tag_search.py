@@ -0,0 +1,94 @@
+"""
+Substring search over tag names.
+
+TagNameIndex keeps every tag name casefolded once and a trigram posting list
+(trigram -> ids of the tags whose name contains it). A query of three or more
+characters is answered by intersecting the postings of its trigrams, smallest
+first, and checking the few survivors; shorter queries scan the casefolded
+names. Either way no name is lowercased again at query time.
+
+    index = TagNameIndex(dm.read_tags() or {})
+    index.search("big")        # -> [tag ids whose name contains "big", in tags.json order]
+    index.update(new_tags)     # after a tag fetch: only changed names are reindexed
+"""
+
+from collections import defaultdict
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TagNameIndex:
+    def __init__(self, tags=None):
+        self.tags = {}                       # tag id -> name, as given
+        self._folded = {}                    # tag id -> casefolded name
+        self._rank = {}                      # tag id -> position, to return results in tags order
+        self._next_rank = 0
+        self._postings = defaultdict(set)    # trigram -> tag ids
+        self.version = 0                     # Bumped by every update that changes something
+        self.update(tags or {})
+
+    def __len__(self):
+        return len(self.tags)
+
+    def _add(self, tag_id, name):
+        folded = name.casefold()
+        self.tags[tag_id] = name
+        self._folded[tag_id] = folded
+        if tag_id not in self._rank:
+            self._rank[tag_id] = self._next_rank
+            self._next_rank += 1
+        for gram in _trigrams(folded):
+            self._postings[gram].add(tag_id)
+
+    def _remove(self, tag_id):
+        folded = self._folded.pop(tag_id)
+        del self.tags[tag_id]
+        for gram in _trigrams(folded):
+            posting = self._postings[gram]
+            posting.discard(tag_id)
+            if not posting:
+                del self._postings[gram]
+
+    def update(self, tags):
+        """
+        Make the index match `tags` ({id: name}), touching only the tags that
+        were added, renamed or dropped.
+        """
+        changed = False
+        for tag_id in [tag_id for tag_id in self.tags if tag_id not in tags]:
+            self._remove(tag_id)
+            del self._rank[tag_id]
+            changed = True
+        for tag_id, name in tags.items():
+            old = self.tags.get(tag_id)
+            if old == name:
+                continue
+            if old is not None:
+                self._remove(tag_id)
+            self._add(tag_id, name)
+            changed = True
+        if changed:
+            self.version += 1
+
+    def search(self, query):
+        """Ids of the tags whose name contains `query` (case-insensitive), in tags order."""
+        query = query.casefold()
+        if not query:
+            return []
+        if len(query) < 3:
+            candidates = self._folded
+        else:
+            postings = sorted((self._postings.get(gram, ()) for gram in _trigrams(query)), key=len)
+            if not postings[0]:
+                return []
+            candidates = set(postings[0]).intersection(*postings[1:])
+            if len(query) == 3:
+                return sorted(candidates, key=self._rank.__getitem__)
+        matches = [tag_id for tag_id in candidates if query in self._folded[tag_id]]
+        return sorted(matches, key=self._rank.__getitem__)
+
+    def matching(self, query):
+        """{id: name} of the tags whose name contains `query`, in tags order."""
+        return {tag_id: self.tags[tag_id] for tag_id in self.search(query)}